@@ -6,3 +6,35 @@ load_dotenv()
 
 API_URL = os.getenv("API_URL")
 API_KEY = os.getenv("API_KEY")
+
+# Registro adicional en formato JSON Lines ('app.log.jsonl')
+LOG_JSON = os.getenv("LOG_JSON", "0").lower() in ("1", "true", "yes")
+
+# Transporte HTTP de Canvas: elementos por página en los listados y conexiones reutilizables por servidor
+CANVAS_PER_PAGE = int(os.getenv("CANVAS_PER_PAGE", 100))
+CANVAS_POOL_SIZE = int(os.getenv("CANVAS_POOL_SIZE", 10))
+
+# Punto de acceso alternativo de la API de Google Sheets (servidor local de pruebas); vacío en producción
+SHEETS_API_ENDPOINT = os.getenv("SHEETS_API_ENDPOINT")
+
+# Segundos durante los que se reutilizan los encabezados y la columna de nombres leídos de una hoja de Google
+SHEETS_SESSION_MAX_AGE = int(os.getenv("SHEETS_SESSION_MAX_AGE", 300))
+
+# Notas de trimestre calculadas por la aplicación: pesos por tarea en JSON (p. ej. '{"TAREA 4": 2}', las demás
+# cuentan 1) y si las tareas sin nota cuentan como 0 en lugar de no contar
+AGGREGATE_TASK_WEIGHTS = os.getenv("AGGREGATE_TASK_WEIGHTS", "{}")
+AGGREGATE_MISSING_AS_ZERO = os.getenv("AGGREGATE_MISSING_AS_ZERO", "0").lower() in ("1", "true", "yes")
+AGGREGATE_DECIMALS = int(os.getenv("AGGREGATE_DECIMALS", 2))
+
+# Caducidad (segundos) de la caché en disco de las listas de Canvas
+CACHE_TTL_COURSES = int(os.getenv("CACHE_TTL_COURSES", 6 * 3600))
+CACHE_TTL_ASSIGNMENTS = int(os.getenv("CACHE_TTL_ASSIGNMENTS", 3600))
+# Número de tareas más recientes cuyas entregas se descargan por adelantado al elegir un curso
+PREFETCH_RECENT_ASSIGNMENTS = int(os.getenv("PREFETCH_RECENT_ASSIGNMENTS", 3))
+# Segundos durante los que se usan esas entregas adelantadas; pasado ese tiempo se vuelven a pedir a Canvas
+PREFETCH_GRADES_TTL = int(os.getenv("PREFETCH_GRADES_TTL", 30))
+
+# URL del servicio local compartido (python -m evaluator.service); si se define, la GUI actúa como cliente ligero
+SERVICE_URL = os.getenv("EVALUATOR_SERVICE_URL")
+# Carpeta fuera de la cual el servicio no abre ni escribe libros Excel (por defecto, la carpeta del usuario)
+SERVICE_ROOT = os.getenv("EVALUATOR_SERVICE_ROOT", os.path.expanduser("~"))
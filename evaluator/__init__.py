@@ -1,25 +1,95 @@
 # evaluator/__init__.py
 
+import atexit
+import copy
+import json
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 LOG_FILENAME = 'app.log'
+JSON_LOG_FILENAME = 'app.log.jsonl'
 
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Formatea cada registro como una línea JSON (formato JSON Lines)."""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _LocalQueueHandler(QueueHandler):
+    """
+    `QueueHandler` que deja `exc_info` en el registro. El `QueueHandler` estándar
+    mete la traza en el mensaje para poder serializarlo, pero esta cola no sale
+    del proceso: así cada formateador de `QueueListener` decide cómo escribirla.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        return record
+
+
+def setup_logging(json_log=False):
+    """
+    Configura el logger para guardar en un archivo y mostrar en consola.
+
+    Los handlers reales se ejecutan en un hilo de fondo (QueueListener); el
+    logger raíz solo encola los registros, de modo que la E/S de disco no
+    bloquea los bucles de procesamiento. Si `json_log` es True se escribe
+    además 'app.log.jsonl' con un registro JSON por línea.
+    """
+    global _listener
 
-def setup_logging():
-    """Configura el logger para guardar en un archivo y mostrar en consola."""
     logger = logging.getLogger()
     logger.setLevel(logging.INFO)
 
+    stop_logging()
     if logger.hasHandlers():
         logger.handlers.clear()
 
     formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
 
-    fh = RotatingFileHandler(LOG_FILENAME, maxBytes=1 * 1024 * 1024, backupCount=1)
+    fh = RotatingFileHandler(LOG_FILENAME, maxBytes=1 * 1024 * 1024, backupCount=1, encoding='utf-8')
     fh.setFormatter(formatter)
-    logger.addHandler(fh)
 
     ch = logging.StreamHandler()
     ch.setFormatter(formatter)
-    logger.addHandler(ch)
\ No newline at end of file
+
+    handlers = [fh, ch]
+    if json_log:
+        jh = RotatingFileHandler(JSON_LOG_FILENAME, maxBytes=1 * 1024 * 1024, backupCount=1, encoding='utf-8')
+        jh.setFormatter(JsonFormatter())
+        handlers.append(jh)
+
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(_LocalQueueHandler(log_queue))
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    """Vacía la cola de logging y detiene el hilo escritor, si existe."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,169 @@
+# evaluator/aggregates.py
+"""
+Notas de trimestre calculadas por la aplicación.
+
+Las plantillas calculan la nota de cada trimestre con fórmulas, pero openpyxl
+no las evalúa: tras guardar un Excel desde la aplicación esas celdas quedan sin
+valor hasta que alguien abre el archivo en Excel. Aquí se calculan con NumPy
+sobre la matriz alumnos × tareas de cada pestaña (las columnas TAREA que
+encuentra `mapping`), como media ponderada de las tareas con nota:
+
+    python -m evaluator.aggregates --excel plantilla.xlsx --all-tabs
+    python -m evaluator.aggregates --excel plantilla.xlsx --write
+
+Los pesos por tarea se configuran con AGGREGATE_TASK_WEIGHTS (p. ej.
+'{"TAREA 4": 2}'; las demás cuentan 1). Con AGGREGATE_MISSING_AS_ZERO=1 las
+tareas sin nota cuentan como 0 en lugar de no contar.
+"""
+
+import argparse
+import json
+import logging
+
+import numpy as np
+import openpyxl.utils
+
+from . import setup_logging
+from .reports import read_grade_book
+from .session import SheetsSession, WorkbookSession
+from config.settings import AGGREGATE_DECIMALS, AGGREGATE_MISSING_AS_ZERO, AGGREGATE_TASK_WEIGHTS
+
+
+def default_weights() -> dict:
+    try:
+        weights = json.loads(AGGREGATE_TASK_WEIGHTS or "{}")
+    except ValueError:
+        logging.warning("AGGREGATE_TASK_WEIGHTS no es JSON válido: %s. Todas las tareas cuentan 1.",
+                        AGGREGATE_TASK_WEIGHTS)
+        return {}
+    return {str(task).upper(): float(weight) for task, weight in weights.items()}
+
+
+def _as_number(value) -> float:
+    if isinstance(value, str):
+        value = value.strip().replace(',', '.')
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def grade_matrix(group: dict) -> np.ndarray:
+    """Matriz alumnos × tareas (float, NaN donde no hay nota numérica) de un grupo de `read_grade_book`."""
+    return np.array([[_as_number(value) for value in grades] for _, _, grades in group['students']],
+                    dtype=float).reshape(len(group['students']), len(group['columns']))
+
+
+def weighted_means(matrix: np.ndarray, weights: np.ndarray, missing_as_zero: bool = False) -> np.ndarray:
+    """
+    Media ponderada por filas. Sin `missing_as_zero` las celdas vacías no
+    cuentan (ni en la suma ni en los pesos); una fila sin ninguna nota da NaN.
+    """
+    present = ~np.isnan(matrix)
+    if missing_as_zero:
+        present = np.ones_like(present)
+    totals = np.where(present, np.nan_to_num(matrix), 0.0) @ weights
+    weight_sums = present @ weights
+    return np.divide(totals, weight_sums, out=np.full(len(matrix), np.nan), where=weight_sums > 0)
+
+
+def compute_aggregates(book: list, maps: dict, weights: dict | None = None,
+                       missing_as_zero: bool = AGGREGATE_MISSING_AS_ZERO,
+                       decimals: int = AGGREGATE_DECIMALS) -> dict:
+    """
+    Nota de cada trimestre por alumno: `{pestaña: {trimestre: {fila: nota o None}}}`.
+    `book` es el resultado de `reports.read_grade_book` y `maps` los mapas de
+    actividades de la sesión.
+    """
+    weights = default_weights() if weights is None else {str(k).upper(): v for k, v in weights.items()}
+    aggregates = {}
+    for group in book:
+        columns = group['columns']
+        rows = np.array([row for row, _, _ in group['students']])
+        matrix = grade_matrix(group)
+        per_trimester = {}
+        for trimester_info in maps[group['sheet_name']]:
+            trimestre = trimester_info['trimestre_name']
+            indices = [i for i, (name, _, _) in enumerate(columns) if name == trimestre]
+            task_weights = np.array([weights.get(columns[i][1].upper(), 1.0) for i in indices], dtype=float)
+            means = np.round(weighted_means(matrix[:, indices], task_weights, missing_as_zero), decimals)
+            per_trimester[trimestre] = {int(row): None if np.isnan(mean) else float(mean)
+                                        for row, mean in zip(rows, means)}
+        aggregates[group['sheet_name']] = per_trimester
+    return aggregates
+
+
+def aggregate_cells(aggregates: dict, maps: dict) -> dict:
+    """
+    `{pestaña: {celda: nota}}` para los trimestres cuya columna de nota se ha
+    localizado en la plantilla. Los alumnos sin ninguna nota se omiten para no
+    vaciar lo que haya escrito a mano en su celda.
+    """
+    cells = {}
+    for sheet_name, per_trimester in aggregates.items():
+        for trimester_info in maps[sheet_name]:
+            column = trimester_info.get('grade_column')
+            if not column:
+                continue
+            for row, value in per_trimester[trimester_info['trimestre_name']].items():
+                if value is not None:
+                    cells.setdefault(sheet_name, {})[f"{column}{row}"] = value
+    return cells
+
+
+def recalculate(session: WorkbookSession | SheetsSession, updates_by_sheet: dict | None = None,
+                sheet_names: list | None = None, weights: dict | None = None) -> dict:
+    """
+    Calcula las notas de trimestre de las pestañas indicadas (por defecto, las
+    que reciben `updates_by_sheet`, o todas) como si ya se hubieran escrito las
+    celdas de `updates_by_sheet`. Devuelve `{pestaña: {celda: nota}}`.
+    """
+    updates_by_sheet = updates_by_sheet or {}
+    sheet_names = sheet_names or [name for name in updates_by_sheet if name in session.maps] or session.sheet_names
+    book = read_grade_book(session, sheet_names)
+    for group in book:
+        updates = updates_by_sheet.get(group['sheet_name'], {})
+        if not updates:
+            continue
+        positions = {col: i for i, (_, _, col) in enumerate(group['columns'])}
+        by_row = {row: grades for row, _, grades in group['students']}
+        for cell, value in updates.items():
+            col, row = openpyxl.utils.cell.coordinate_from_string(cell)
+            if col in positions and row in by_row:
+                by_row[row][positions[col]] = value
+    cells = aggregate_cells(compute_aggregates(book, session.maps, weights), session.maps)
+    logging.info("Notas de trimestre recalculadas: %d celdas en %d pestañas.",
+                 sum(len(values) for values in cells.values()), len(cells))
+    return cells
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calcula las notas de trimestre de una plantilla de evaluación.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--excel', help="Ruta de la plantilla Excel")
+    source.add_argument('--sheets', help="ID de la hoja de Google")
+    parser.add_argument('--all-tabs', action='store_true', help="Todas las pestañas con formato de plantilla")
+    parser.add_argument('--write', action='store_true',
+                        help="Guarda las notas en las columnas de nota sin fórmula (solo Excel)")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    if args.excel:
+        session = WorkbookSession(args.excel, all_tabs=args.all_tabs)
+    else:
+        session = SheetsSession(args.sheets, all_tabs=args.all_tabs)
+    book = read_grade_book(session)
+    aggregates = compute_aggregates(book, session.maps)
+    for group in book:
+        trimestres = list(aggregates[group['sheet_name']])
+        print(f"\n[{group['sheet_name']}]")
+        print(f"{'fila':>4}  {'alumno':<35}" + "".join(f"{t:>16}" for t in trimestres))
+        for row, name, _ in group['students']:
+            marks = [aggregates[group['sheet_name']][t][row] for t in trimestres]
+            print(f"{row:>4}  {name[:35]:<35}" + "".join(f"{'-' if m is None else m:>16}" for m in marks))
+    if args.write and isinstance(session, WorkbookSession):
+        session.write_cells({}, cached_values=aggregate_cells(aggregates, session.maps))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# evaluator/cache.py
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+CACHE_DIR = os.path.join('.cache', 'canvas')
+
+
+class TTLCache:
+    """
+    Caché clave → valor JSON con caducidad, en memoria y en disco (un archivo por
+    clave), para que las listas de Canvas estén disponibles al instante en un
+    arranque en caliente.
+    """
+
+    def __init__(self, directory: str = CACHE_DIR, ttl: float = 3600):
+        self.directory = directory
+        self.ttl = ttl
+        self._memory = {}
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.json')
+
+    def get(self, key: str, ttl: float | None = None):
+        """Devuelve el valor guardado o None si no existe o ha caducado."""
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            item = self._memory.get(key)
+        if item is None:
+            try:
+                with open(self._path(key), 'r', encoding='utf-8') as f:
+                    item = json.load(f)
+            except (OSError, ValueError):
+                return None
+            with self._lock:
+                self._memory[key] = item
+        if time.time() - item['stored_at'] > ttl:
+            return None
+        return item['value']
+
+    def set(self, key: str, value):
+        item = {'key': key, 'stored_at': time.time(), 'value': value}
+        with self._lock:
+            self._memory[key] = item
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{self._path(key)}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(item, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            logging.warning("No se pudo guardar en la caché de disco la clave '%s': %s", key, e)
+
+    def get_or_fetch(self, key: str, fetch, ttl: float | None = None, refresh: bool = False):
+        """Devuelve el valor en caché o lo obtiene con `fetch()` y lo guarda."""
+        if not refresh:
+            value = self.get(key, ttl)
+            if value is not None:
+                return value
+        value = fetch()
+        self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith('.json'):
+                    os.remove(os.path.join(self.directory, name))
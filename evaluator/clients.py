@@ -3,54 +3,197 @@
 import logging
 import pandas as pd
 from canvasapi import Canvas
-from config.settings import API_URL, API_KEY
+from canvasapi.assignment import Assignment
+from canvasapi.course import Course
+from config.settings import (API_URL, API_KEY, SHEETS_API_ENDPOINT, CACHE_TTL_COURSES, CACHE_TTL_ASSIGNMENTS,
+                             CANVAS_PER_PAGE, CANVAS_POOL_SIZE)
 import os
+import threading
+import time
+from contextlib import contextmanager
+from requests.adapters import HTTPAdapter
+from google.auth.credentials import AnonymousCredentials
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 
+from .cache import TTLCache
+
 # --- CANVAS CLIENT ---
-try:
-    canvas = Canvas(API_URL, API_KEY)
-    logging.info("Conexión con la API de Canvas establecida correctamente.")
-except Exception as e:
-    logging.error(f"No se pudo establecer la conexión inicial con Canvas: {e}")
-    canvas = None
-
-def obtener_cursos():
+canvas = None
+canvas_url = API_URL
+list_cache = TTLCache()
+
+# Peticiones y bytes intercambiados con Canvas: totales del proceso y, dentro de `_logged_transfer`, por operación
+transfer_totals = {'requests': 0, 'bytes': 0, 'bytes_decoded': 0}
+_transfer_lock = threading.Lock()
+_transfer_local = threading.local()
+
+def _count_transfer(response, *args, **kwargs):
+    """Hook de `requests`: suma la petición y sus bytes (en la red, comprimidos, y ya descomprimidos)."""
+    decoded = len(response.content)
+    try:
+        wire = response.raw.tell() or decoded
+    except (AttributeError, OSError):
+        wire = int(response.headers.get('Content-Length') or decoded)
+    with _transfer_lock:
+        for stats in (transfer_totals, getattr(_transfer_local, 'stats', None)):
+            if stats is not None:
+                stats['requests'] += 1
+                stats['bytes'] += wire
+                stats['bytes_decoded'] += decoded
+    return response
+
+@contextmanager
+def _logged_transfer(label):
+    """Registra cuántas peticiones y bytes a Canvas ha costado la operación `label` en este hilo."""
+    previous = getattr(_transfer_local, 'stats', None)
+    stats = {'requests': 0, 'bytes': 0, 'bytes_decoded': 0}
+    _transfer_local.stats = stats
+    start = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        _transfer_local.stats = previous
+        if previous is not None:
+            for key in stats:
+                previous[key] += stats[key]
+        logging.info("Canvas (%s): %d peticiones, %.1f KB transferidos (%.1f KB sin comprimir) en %.2f s.",
+                     label, stats['requests'], stats['bytes'] / 1024, stats['bytes_decoded'] / 1024,
+                     time.perf_counter() - start)
+
+def _configure_session(session):
+    """Conexiones persistentes reutilizables entre hilos, respuestas comprimidas y recuento de tráfico."""
+    adapter = HTTPAdapter(pool_connections=CANVAS_POOL_SIZE, pool_maxsize=CANVAS_POOL_SIZE)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['Accept-Encoding'] = 'gzip, deflate'
+    session.hooks['response'].append(_count_transfer)
+
+def _requester():
+    # canvasapi no expone su Requester; se usa para ajustar su sesión y construir objetos sin pedirlos.
+    return canvas._Canvas__requester
+
+def connect_canvas(api_url=API_URL, api_key=API_KEY):
+    """(Re)crea la instancia de Canvas; permite apuntar a otro servidor (p. ej. el falso de las pruebas de carga)."""
+    global canvas, canvas_url
+    canvas_url = api_url
+    try:
+        canvas = Canvas(api_url, api_key)
+        _configure_session(_requester()._session)
+        logging.info("Conexión con la API de Canvas establecida correctamente.")
+    except Exception as e:
+        logging.error("No se pudo establecer la conexión inicial con Canvas: %s", e)
+        canvas = None
+    return canvas
+
+connect_canvas()
+
+def _cache_key(*parts):
+    return "|".join(str(p) for p in (canvas_url,) + parts)
+
+def _course(curso_id):
+    """Curso de canvasapi construido solo con su id, sin la petición GET que haría `canvas.get_course`."""
+    return Course(_requester(), {'id': curso_id})
+
+def _assignment(curso_id, tarea_id):
+    return Assignment(_requester(), {'id': tarea_id, 'course_id': curso_id})
+
+def obtener_cursos(use_cache=True):
     if not canvas: raise ConnectionError("La instancia de Canvas no está disponible.")
-    cursos = canvas.get_courses(enrollment_state='active')
-    return {curso.name: curso.id for curso in cursos if hasattr(curso, 'name')}
 
-def obtener_tareas(curso_id):
+    def fetch():
+        with _logged_transfer("cursos"):
+            cursos = canvas.get_courses(enrollment_state='active', per_page=CANVAS_PER_PAGE)
+            return {curso.name: curso.id for curso in _iter_pages(cursos) if hasattr(curso, 'name')}
+
+    return list_cache.get_or_fetch(_cache_key('cursos'), fetch, ttl=CACHE_TTL_COURSES, refresh=not use_cache)
+
+def obtener_tareas_detalle(curso_id, use_cache=True):
+    """Tareas del curso con sus fechas, de la más reciente a la más antigua."""
     if not canvas: raise ConnectionError("La instancia de Canvas no está disponible.")
-    curso = canvas.get_course(curso_id)
-    return {tarea.name: tarea.id for tarea in curso.get_assignments()}
 
-def obtener_alumnos(curso_id):
+    def fetch():
+        with _logged_transfer(f"tareas del curso {curso_id}"):
+            # El enunciado y la rúbrica son lo más pesado de cada tarea y no se usan.
+            listado = _course(curso_id).get_assignments(per_page=CANVAS_PER_PAGE,
+                                                        exclude_response_fields=['description', 'rubric'])
+            tareas = [{'id': t.id, 'name': t.name, 'due_at': getattr(t, 'due_at', None),
+                       'created_at': getattr(t, 'created_at', None)} for t in _iter_pages(listado)]
+        tareas.sort(key=lambda t: t['due_at'] or t['created_at'] or '', reverse=True)
+        return tareas
+
+    return list_cache.get_or_fetch(_cache_key('tareas', curso_id), fetch, ttl=CACHE_TTL_ASSIGNMENTS,
+                                   refresh=not use_cache)
+
+def obtener_tareas(curso_id, use_cache=True):
+    return {tarea['name']: tarea['id'] for tarea in obtener_tareas_detalle(curso_id, use_cache)}
+
+def _iter_pages(paginated):
+    """Recorre un `PaginatedList` de canvasapi página a página sin que acumule los elementos ya vistos."""
+    while paginated._has_next():
+        yield from paginated._get_next_page()
+
+def iter_alumnos(curso_id):
+    """Genera los alumnos del curso ({'id', 'name'}) a medida que llegan las páginas de Canvas."""
     if not canvas: raise ConnectionError("La instancia de Canvas no está disponible.")
-    curso = canvas.get_course(curso_id)
-    alumnos = curso.get_users(enrollment_type=['student'], sort="sortable_name", order="asc")
-    lista_alumnos = [{'id': al.id, 'name': al.sortable_name} for al in alumnos if hasattr(al, 'sortable_name')]
-    return pd.DataFrame(lista_alumnos)
+    with _logged_transfer(f"alumnos del curso {curso_id}"):
+        alumnos = _course(curso_id).get_users(enrollment_type=['student'], sort="sortable_name", order="asc",
+                                              per_page=CANVAS_PER_PAGE)
+        for al in _iter_pages(alumnos):
+            if hasattr(al, 'sortable_name'):
+                yield {'id': al.id, 'name': al.sortable_name}
 
-def obtener_calificaciones(curso_id, tarea_id):
+def iter_calificaciones(curso_id, tarea_id, include_user=False):
+    """
+    Genera las entregas de la tarea ({'user_id', 'score'}) página a página. Con
+    `include_user` cada entrega trae además el nombre del alumno ('name'), así
+    que no hace falta cruzarla con la lista completa de alumnos.
+    """
     if not canvas: raise ConnectionError("La instancia de Canvas no está disponible.")
-    curso = canvas.get_course(curso_id)
-    tarea = curso.get_assignment(tarea_id)
-    submissions = tarea.get_submissions()
-    return pd.DataFrame([{'user_id': s.user_id, 'score': s.score} for s in submissions])
+    params = {'per_page': CANVAS_PER_PAGE}
+    if include_user:
+        params['include'] = ['user']
+    with _logged_transfer(f"entregas de la tarea {tarea_id}"):
+        for s in _iter_pages(_assignment(curso_id, tarea_id).get_submissions(**params)):
+            record = {'user_id': s.user_id, 'score': s.score}
+            if include_user:
+                record['name'] = (getattr(s, 'user', None) or {}).get('sortable_name')
+            yield record
+
+def obtener_alumnos(curso_id):
+    return pd.DataFrame(list(iter_alumnos(curso_id)))
+
+def obtener_calificaciones(curso_id, tarea_id):
+    return pd.DataFrame(list(iter_calificaciones(curso_id, tarea_id)))
 
 # --- GOOGLE SHEETS CLIENT ---
 SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SERVICE_ACCOUNT_FILE = os.path.join(BASE_DIR, "config", "service_account.json")
 
+_sheets_local = threading.local()
+
 def get_sheets_service():
+    """
+    Devuelve el servicio de Google Sheets del hilo actual, creándolo la primera vez.
+    Construir el servicio es costoso y su conexión HTTP no es segura entre hilos,
+    así que se reutiliza uno por hilo.
+    """
+    endpoint = SHEETS_API_ENDPOINT
+    cached = getattr(_sheets_local, 'service', None)
+    if cached is not None and cached[0] == endpoint:
+        return cached[1]
     try:
-        creds = service_account.Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
-        return build('sheets', 'v4', credentials=creds)
+        if endpoint:
+            service = build('sheets', 'v4', credentials=AnonymousCredentials(), static_discovery=True,
+                            client_options={'api_endpoint': endpoint})
+        else:
+            creds = service_account.Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
+            service = build('sheets', 'v4', credentials=creds)
+        _sheets_local.service = (endpoint, service)
+        return service
     except FileNotFoundError:
-        logging.error(f"Archivo de credenciales de Google no encontrado en: {SERVICE_ACCOUNT_FILE}")
+        logging.error("Archivo de credenciales de Google no encontrado en: %s", SERVICE_ACCOUNT_FILE)
         raise
     except Exception as e:
         logging.error("Error al inicializar el servicio de Google Sheets: %s", e)
@@ -60,11 +203,49 @@ def get_gsheet_values(spreadsheet_id, range_name):
     service = get_sheets_service()
     full_range = f"{range_name.split('!')[0]}!A1:AZ100"
     result = service.spreadsheets().values().get(spreadsheetId=spreadsheet_id, range=full_range).execute()
-    logging.info(f"Se han leído datos del rango ampliado '{full_range}'.")
+    logging.info("Se han leído datos del rango ampliado '%s'.", full_range)
     return result.get('values', [])
 
+def a1_range(sheet_name, cells):
+    """Compone un rango A1 citando el nombre de la pestaña (admite espacios y apóstrofos)."""
+    escaped = sheet_name.replace("'", "''")
+    return f"'{escaped}'!{cells}"
+
+def get_gsheet_sheet_titles(spreadsheet_id):
+    service = get_sheets_service()
+    result = service.spreadsheets().get(spreadsheetId=spreadsheet_id, fields='sheets.properties.title').execute()
+    return [sheet['properties']['title'] for sheet in result.get('sheets', [])]
+
+def batch_get_gsheet_ranges(spreadsheet_id, ranges):
+    """
+    Lee varios rangos en una sola petición `batchGet`, con los valores sin formato
+    (números como números) y pidiendo solo los campos que se usan. Devuelve una
+    lista de filas por rango, en el mismo orden que `ranges`.
+    """
+    service = get_sheets_service()
+    result = service.spreadsheets().values().batchGet(
+        spreadsheetId=spreadsheet_id, ranges=ranges, valueRenderOption='UNFORMATTED_VALUE',
+        majorDimension='ROWS', fields='valueRanges(range,values)').execute()
+    value_ranges = result.get('valueRanges', [])
+    logging.info("Se han leído %d rangos de Google Sheets en una sola petición.", len(ranges))
+    return [value_range.get('values', []) for value_range in value_ranges]
+
 def update_gsheet_values(spreadsheet_id, range_name, values):
     service = get_sheets_service()
     body = {'values': values}
     result = service.spreadsheets().values().update(spreadsheetId=spreadsheet_id, range=range_name, valueInputOption="USER_ENTERED", body=body).execute()
-    logging.info(f"Se han actualizado {result.get('updatedCells')} celdas en Google Sheets.")
\ No newline at end of file
+    logging.info("Se han actualizado %s celdas en Google Sheets.", result.get('updatedCells'))
+
+def batch_update_gsheet_values(spreadsheet_id, data):
+    """Escribe varios rangos en una sola petición. `data` es una lista de {'range', 'values'}."""
+    service = get_sheets_service()
+    body = {'valueInputOption': "USER_ENTERED", 'data': data}
+    result = service.spreadsheets().values().batchUpdate(spreadsheetId=spreadsheet_id, body=body).execute()
+    logging.info("Se han actualizado %s celdas en Google Sheets (%d rangos).", result.get('totalUpdatedCells'), len(data))
+    return result
+
+def batch_update_gsheet_cells(spreadsheet_id, updates_by_sheet):
+    """Escribe `{pestaña: {celda: valor}}` en una sola petición `batchUpdate`."""
+    data = [{'range': a1_range(sheet_name, cell), 'values': [[value]]}
+            for sheet_name, updates in updates_by_sheet.items() for cell, value in updates.items()]
+    return batch_update_gsheet_values(spreadsheet_id, data)
@@ -0,0 +1,506 @@
+# evaluator/fake_servers.py
+"""
+Servidores HTTP locales que imitan las partes de Canvas y Google Sheets que usa
+la aplicación, para medir `clients` y `processor` sin credenciales reales.
+
+- Canvas: cursos, alumnos, tareas y entregas, con paginación por cabecera
+  `Link` y cabeceras de límite de peticiones (`X-Rate-Limit-Remaining`).
+- Sheets: `values.get`, `values.batchGet`, `values.update`,
+  `values.batchUpdate` y la lista de pestañas de `spreadsheets.get`.
+
+Ambos admiten latencia, tasa de errores y cuota configurables. Se arrancan en un
+hilo dentro del propio proceso:
+
+    with FakeCanvasServer(courses=5, students=30) as canvas_srv:
+        clients.connect_canvas(canvas_srv.url, "token")
+"""
+
+import gzip
+import json
+import random
+import re
+import threading
+import time
+from collections.abc import Sequence
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlencode, urlparse
+
+import openpyxl
+import openpyxl.utils
+
+FIRST_STUDENT_ROW = 10
+TASKS_PER_TRIMESTER = 4
+GZIP_MIN_BYTES = 512
+
+
+class FaultInjector:
+    """Latencia, errores aleatorios y cuota (cubo de fichas) compartidos por un servidor."""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, quota=None, refill_per_second=None, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.quota = quota
+        self.refill_per_second = refill_per_second
+        self._tokens = quota
+        self._last_refill = time.monotonic()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def delay(self):
+        wait = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+        if wait:
+            time.sleep(wait)
+
+    def should_fail(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def take_token(self):
+        """Consume una ficha de cuota. Devuelve (permitido, fichas restantes)."""
+        if self.quota is None:
+            return True, None
+        with self._lock:
+            if self.refill_per_second:
+                now = time.monotonic()
+                self._tokens = min(self.quota, self._tokens + (now - self._last_refill) * self.refill_per_second)
+                self._last_refill = now
+            if self._tokens < 1:
+                return False, 0
+            self._tokens -= 1
+            return True, int(self._tokens)
+
+
+class _FakeServer:
+    """Base común: arranca un `ThreadingHTTPServer` en un puerto libre y cuenta peticiones."""
+
+    handler_class = None
+
+    def __init__(self, faults: FaultInjector | None = None, host='127.0.0.1', port=0):
+        self.faults = faults or FaultInjector()
+        self.request_counts = {}
+        self._counts_lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self.handler_class)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, endpoint: str):
+        with self._counts_lock:
+            self.request_counts[endpoint] = self.request_counts.get(endpoint, 0) + 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class _JsonHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    @property
+    def fake(self):
+        return self.server.fake
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        compress = len(body) >= GZIP_MIN_BYTES and 'gzip' in (self.headers.get('Accept-Encoding') or '')
+        if compress:
+            body = gzip.compress(body, compresslevel=5)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        if compress:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length) or b'{}') if length else {}
+
+    def _dispatch(self, method):
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+        self.fake.faults.delay()
+        route = self.route(method, parsed.path)
+        if route is None:
+            self._send_json(404, {'errors': [{'message': 'not found'}]})
+            return
+        endpoint, handler, params = route
+        self.fake.count(endpoint)
+        allowed, remaining = self.fake.faults.take_token()
+        if not allowed:
+            self.send_quota_exceeded()
+            return
+        if self.fake.faults.should_fail():
+            self._send_json(503, {'errors': [{'message': 'injected failure'}]})
+            return
+        handler(params, query, remaining)
+
+    def route(self, method, path):
+        raise NotImplementedError
+
+    def send_quota_exceeded(self):
+        raise NotImplementedError
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_PUT(self):
+        self._dispatch('PUT')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+
+# --- CANVAS ---
+
+class _CanvasHandler(_JsonHandler):
+
+    ROUTES = [
+        ('GET', r'/api/v1/courses', 'courses', '_courses'),
+        ('GET', r'/api/v1/courses/(?P<course>\d+)', 'course', '_course'),
+        ('GET', r'/api/v1/courses/(?P<course>\d+)/users', 'users', '_users'),
+        ('GET', r'/api/v1/courses/(?P<course>\d+)/search_users', 'users', '_users'),
+        ('GET', r'/api/v1/courses/(?P<course>\d+)/assignments', 'assignments', '_assignments'),
+        ('GET', r'/api/v1/courses/(?P<course>\d+)/assignments/(?P<assignment>\d+)', 'assignment', '_assignment'),
+        ('GET', r'/api/v1/courses/(?P<course>\d+)/assignments/(?P<assignment>\d+)/submissions', 'submissions',
+         '_submissions'),
+    ]
+
+    def route(self, method, path):
+        for route_method, pattern, endpoint, handler in self.ROUTES:
+            match = re.fullmatch(pattern, path.rstrip('/'))
+            if route_method == method and match:
+                return endpoint, getattr(self, handler), match.groupdict()
+        return None
+
+    def send_quota_exceeded(self):
+        self._send_json(403, {'errors': [{'message': 'Rate Limit Exceeded'}]},
+                        {'X-Rate-Limit-Remaining': '0.0'})
+
+    def _rate_headers(self, remaining):
+        return {'X-Request-Cost': '0.01', 'X-Rate-Limit-Remaining': f"{remaining if remaining is not None else 700}.0"}
+
+    def _paginate(self, items, query, remaining):
+        per_page = max(1, min(int(query.get('per_page', ['10'])[0]), self.fake.max_per_page))
+        page = max(1, int(query.get('page', ['1'])[0]))
+        chunk = items[(page - 1) * per_page: page * per_page]
+        headers = self._rate_headers(remaining)
+        if page * per_page < len(items):
+            params = {k: v for k, v in query.items() if k not in ('page', 'per_page')}
+            params.update({'page': [str(page + 1)], 'per_page': [str(per_page)]})
+            path = urlparse(self.path).path
+            headers['Link'] = f'<{self.fake.url}{path}?{urlencode(params, doseq=True)}>; rel="next"'
+        self._send_json(200, chunk, headers)
+
+    def _course_or_404(self, params):
+        course = self.fake.courses.get(int(params['course']))
+        if course is None:
+            self._send_json(404, {'errors': [{'message': 'The specified resource does not exist.'}]})
+        return course
+
+    def _courses(self, params, query, remaining):
+        items = [{'id': c['id'], 'name': c['name'], 'course_code': c['course_code']} for c in self.fake.courses.values()]
+        self._paginate(items, query, remaining)
+
+    def _course(self, params, query, remaining):
+        course = self._course_or_404(params)
+        if course:
+            self._send_json(200, {'id': course['id'], 'name': course['name'], 'course_code': course['course_code']},
+                            self._rate_headers(remaining))
+
+    def _users(self, params, query, remaining):
+        course = self._course_or_404(params)
+        if course:
+            self._paginate(course['students'], query, remaining)
+
+    def _assignments(self, params, query, remaining):
+        course = self._course_or_404(params)
+        if course:
+            excluded = set(query.get('exclude_response_fields[]', []))
+            items = [{k: v for k, v in assignment.items() if k not in excluded}
+                     for assignment in course['assignments'].values()]
+            self._paginate(items, query, remaining)
+
+    def _assignment(self, params, query, remaining):
+        course = self._course_or_404(params)
+        if course:
+            assignment = course['assignments'].get(int(params['assignment']))
+            if assignment is None:
+                self._send_json(404, {'errors': [{'message': 'The specified resource does not exist.'}]})
+            else:
+                self._send_json(200, assignment, self._rate_headers(remaining))
+
+    def _submissions(self, params, query, remaining):
+        course = self._course_or_404(params)
+        if course:
+            include_user = 'user' in query.get('include[]', [])
+            self._paginate(_SubmissionList(course, int(params['assignment']), include_user), query, remaining)
+
+
+class _SubmissionList(Sequence):
+    """Entregas de una tarea construidas solo para la página pedida (cursos de cientos de miles de alumnos)."""
+
+    def __init__(self, course, assignment_id, include_user):
+        self.course = course
+        self.assignment_id = assignment_id
+        self.include_user = include_user
+
+    def __len__(self):
+        return len(self.course['students'])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        student = self.course['students'][index]
+        submission = {'id': self.assignment_id * 100000 + student['id'], 'assignment_id': self.assignment_id,
+                      'user_id': student['id'],
+                      'score': self.course['scores'][self.assignment_id].get(student['id'])}
+        if self.include_user:
+            submission['user'] = student
+        return submission
+
+
+class FakeCanvasServer(_FakeServer):
+    """Canvas falso con `courses` cursos de `students` alumnos y `assignments` tareas cada uno."""
+
+    handler_class = _CanvasHandler
+
+    def __init__(self, courses=3, students=30, assignments=8, missing_rate=0.1, max_per_page=100,
+                 faults: FaultInjector | None = None, seed=0, **kwargs):
+        super().__init__(faults, **kwargs)
+        self.max_per_page = max_per_page
+        rnd = random.Random(seed)
+        self.courses = {}
+        for c in range(courses):
+            course_id = 1000 + c
+            student_list = [{'id': course_id * 1000 + s, 'name': f"Nombre{s} Apellido{s} Segundo{s}",
+                             'sortable_name': f"Apellido{s} Segundo{s}, Nombre{s}"} for s in range(students)]
+            assignment_map = {}
+            scores = {}
+            for a in range(assignments):
+                assignment_id = course_id * 100 + a
+                assignment_map[assignment_id] = {'id': assignment_id, 'course_id': course_id,
+                                                 'name': f"TAREA {a + 1}", 'points_possible': 10,
+                                                 'description': f"<p>Enunciado de la tarea {a + 1}.</p>" * 40,
+                                                 'rubric': [{'id': f"r{r}", 'points': 2.5,
+                                                             'description': f"Criterio {r + 1}"} for r in range(4)],
+                                                 'due_at': f"2025-{9 + a % 4:02d}-{1 + a:02d}T23:59:00Z"}
+                scores[assignment_id] = {
+                    st['id']: (None if rnd.random() < missing_rate else round(rnd.uniform(0, 10), 2))
+                    for st in student_list
+                }
+            self.courses[course_id] = {'id': course_id, 'name': f"Curso {c + 1}", 'course_code': f"C{c + 1}",
+                                       'students': student_list,
+                                       'assignments': assignment_map, 'scores': scores}
+
+
+# --- GOOGLE SHEETS ---
+
+_CELL_RE = re.compile(r"^([A-Z]+)?(\d+)?$")
+
+
+def _split_range(a1: str):
+    """Separa "'Pestaña'!A1:B2" en (pestaña, 'A1:B2' o None)."""
+    if '!' in a1:
+        sheet, cells = a1.rsplit('!', 1)
+    else:
+        sheet, cells = a1, None
+    if sheet.startswith("'") and sheet.endswith("'"):
+        sheet = sheet[1:-1].replace("''", "'")
+    return sheet, cells
+
+
+def _parse_cells(cells: str | None):
+    """Devuelve (fila0, col0, fila1, col1) en base 0 inclusiva; None = hasta el final."""
+    if not cells:
+        return 0, 0, None, None
+    start, _, end = cells.partition(':')
+    end = end or start
+
+    def parse(ref, default_row, default_col):
+        match = _CELL_RE.match(ref.upper())
+        col = openpyxl.utils.column_index_from_string(match.group(1)) - 1 if match.group(1) else default_col
+        row = int(match.group(2)) - 1 if match.group(2) else default_row
+        return row, col
+
+    r0, c0 = parse(start, 0, 0)
+    r1, c1 = parse(end, None, None)
+    return r0, c0, r1, c1
+
+
+class _SheetsHandler(_JsonHandler):
+
+    ROUTES = [
+        ('GET', r'/v4/spreadsheets/(?P<id>[^/:]+)/values:batchGet', 'values.batchGet', '_batch_get'),
+        ('POST', r'/v4/spreadsheets/(?P<id>[^/:]+)/values:batchUpdate', 'values.batchUpdate', '_batch_update'),
+        ('GET', r'/v4/spreadsheets/(?P<id>[^/:]+)/values/(?P<range>.+)', 'values.get', '_get'),
+        ('PUT', r'/v4/spreadsheets/(?P<id>[^/:]+)/values/(?P<range>.+)', 'values.update', '_update'),
+        ('GET', r'/v4/spreadsheets/(?P<id>[^/:]+)', 'spreadsheets.get', '_spreadsheet'),
+    ]
+
+    def route(self, method, path):
+        for route_method, pattern, endpoint, handler in self.ROUTES:
+            match = re.fullmatch(pattern, path)
+            if route_method == method and match:
+                params = {k: unquote(v) for k, v in match.groupdict().items()}
+                return endpoint, getattr(self, handler), params
+        return None
+
+    def send_quota_exceeded(self):
+        self._send_json(429, {'error': {'code': 429, 'status': 'RESOURCE_EXHAUSTED',
+                                        'message': 'Quota exceeded for quota metric "Read requests"'}})
+
+    def _spreadsheet_or_404(self, params):
+        spreadsheet = self.fake.spreadsheets.get(params['id'])
+        if spreadsheet is None:
+            self._send_json(404, {'error': {'code': 404, 'status': 'NOT_FOUND', 'message': 'Requested entity was not found.'}})
+        return spreadsheet
+
+    def _spreadsheet(self, params, query, remaining):
+        spreadsheet = self._spreadsheet_or_404(params)
+        if spreadsheet is not None:
+            self._send_json(200, {'sheets': [{'properties': {'title': title}} for title in spreadsheet]})
+
+    def _read(self, spreadsheet, a1, render):
+        sheet_name, cells = _split_range(a1)
+        grid = spreadsheet.get(sheet_name)
+        if grid is None:
+            return None
+        r0, c0, r1, c1 = _parse_cells(cells)
+        rows = grid[r0: None if r1 is None else r1 + 1]
+        values = []
+        for row in rows:
+            values.append([v if render == 'UNFORMATTED_VALUE' else ('' if v is None else str(v))
+                           for v in row[c0: None if c1 is None else c1 + 1]])
+        while values and not any(v not in ('', None) for v in values[-1]):
+            values.pop()
+        return {'range': a1, 'majorDimension': 'ROWS', 'values': [self._trim(row) for row in values]}
+
+    @staticmethod
+    def _trim(row):
+        row = list(row)
+        while row and row[-1] in ('', None):
+            row.pop()
+        return row
+
+    def _get(self, params, query, remaining):
+        spreadsheet = self._spreadsheet_or_404(params)
+        if spreadsheet is not None:
+            render = query.get('valueRenderOption', ['FORMATTED_VALUE'])[0]
+            result = self._read(spreadsheet, params['range'], render)
+            if result is None:
+                self._send_json(400, {'error': {'code': 400, 'message': f"Unable to parse range: {params['range']}"}})
+            else:
+                self._send_json(200, result)
+
+    def _batch_get(self, params, query, remaining):
+        spreadsheet = self._spreadsheet_or_404(params)
+        if spreadsheet is not None:
+            render = query.get('valueRenderOption', ['FORMATTED_VALUE'])[0]
+            value_ranges = [self._read(spreadsheet, a1, render) for a1 in query.get('ranges', [])]
+            if any(vr is None for vr in value_ranges):
+                self._send_json(400, {'error': {'code': 400, 'message': 'Unable to parse range'}})
+            else:
+                self._send_json(200, {'spreadsheetId': params['id'], 'valueRanges': value_ranges})
+
+    def _write(self, spreadsheet, a1, values):
+        sheet_name, cells = _split_range(a1)
+        grid = spreadsheet.setdefault(sheet_name, [])
+        r0, c0, _, _ = _parse_cells(cells)
+        updated = 0
+        with self.fake.lock:
+            for i, row_values in enumerate(values):
+                while len(grid) <= r0 + i:
+                    grid.append([])
+                row = grid[r0 + i]
+                for j, value in enumerate(row_values):
+                    while len(row) <= c0 + j:
+                        row.append(None)
+                    row[c0 + j] = value
+                    updated += 1
+        return updated
+
+    def _update(self, params, query, remaining):
+        spreadsheet = self._spreadsheet_or_404(params)
+        if spreadsheet is not None:
+            body = self._read_json()
+            updated = self._write(spreadsheet, params['range'], body.get('values', []))
+            self._send_json(200, {'spreadsheetId': params['id'], 'updatedRange': params['range'], 'updatedCells': updated})
+
+    def _batch_update(self, params, query, remaining):
+        spreadsheet = self._spreadsheet_or_404(params)
+        if spreadsheet is not None:
+            body = self._read_json()
+            total = sum(self._write(spreadsheet, item['range'], item.get('values', [])) for item in body.get('data', []))
+            self._send_json(200, {'spreadsheetId': params['id'], 'totalUpdatedCells': total,
+                                  'totalUpdatedRanges': len(body.get('data', []))})
+
+
+def build_template_grid(student_names: list, trimesters=3, tasks=TASKS_PER_TRIMESTER) -> list:
+    """Rejilla con el formato de la plantilla de evaluación (encabezados en la fila 5, tareas en la 9)."""
+    width = 3 + trimesters * (tasks + 2)
+    grid = [[None] * width for _ in range(FIRST_STUDENT_ROW - 1 + max(len(student_names), 35))]
+    for t in range(trimesters):
+        first_col = 3 + t * (tasks + 2)
+        grid[4][first_col] = "RESULTADO APRENDIZAJE-CRITERIO DE EVALUACIÓN PRÁCTICOS"
+        for k in range(tasks):
+            grid[8][first_col + k] = f"TAREA {k + 1}"
+        grid[8][first_col + tasks] = "NOTA"
+    for i, name in enumerate(student_names):
+        grid[FIRST_STUDENT_ROW - 1 + i][2] = name
+    return grid
+
+
+def write_template_workbook(path: str, student_names: list, sheet_name: str = 'EVALUACIÓN'):
+    """Guarda en `path` una plantilla Excel equivalente a `build_template_grid`, con los encabezados combinados."""
+    grid = build_template_grid(student_names)
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = sheet_name
+    for r, row in enumerate(grid, start=1):
+        for c, value in enumerate(row, start=1):
+            if value is not None:
+                sheet.cell(row=r, column=c, value=value)
+    header_cols = [c for c, value in enumerate(grid[4], start=1) if value]
+    for first_col in header_cols:
+        sheet.merge_cells(start_row=5, start_column=first_col, end_row=5, end_column=first_col + TASKS_PER_TRIMESTER)
+    workbook.save(path)
+    return path
+
+
+class FakeSheetsServer(_FakeServer):
+    """Google Sheets falso. `spreadsheets` es `{id: {pestaña: filas}}`."""
+
+    handler_class = _SheetsHandler
+
+    def __init__(self, spreadsheets: dict | None = None, faults: FaultInjector | None = None, **kwargs):
+        super().__init__(faults, **kwargs)
+        self.spreadsheets = spreadsheets if spreadsheets is not None else {}
+        self.lock = threading.Lock()
+
+    def add_template(self, spreadsheet_id: str, student_names: list, sheet_name: str = 'EVALUACIÓN'):
+        self.spreadsheets.setdefault(spreadsheet_id, {})[sheet_name] = build_template_grid(student_names)
+        return spreadsheet_id
@@ -2,18 +2,23 @@
 
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-import pandas as pd
-import openpyxl
 import re
 import json
 import os
 import shutil
 from datetime import datetime
 import logging
+from concurrent.futures import ThreadPoolExecutor
 
 from . import clients
 from . import mapping
 from . import processor
+from . import reports
+from .plan import WritePlan
+from .prefetch import Prefetcher
+from .service_client import ServiceClient
+from .session import SheetsSession, WorkbookSession
+from config.settings import PREFETCH_GRADES_TTL, PREFETCH_RECENT_ASSIGNMENTS, SERVICE_URL
 
 
 class MainApp(tk.Tk):
@@ -26,14 +31,31 @@ class MainApp(tk.Tk):
 
         self.source_type = tk.StringVar(value="excel")
         self.excel_file_path = None
+        self.excel_session = None
+        self.gsheet_session = None
         self.spreadsheet_id = None
 
         self.cursos_canvas_dict = {}
         self.tareas_canvas_dict = {}
         self.df_alumnos_del_curso = None
         self.trimester_data_map = []
+        self.dest_maps = {}
+        self.multi_tab = tk.BooleanVar(value=False)
+        self.recalculate_aggregates = tk.BooleanVar(value=False)
+        self.sync_routes = []
+        self.write_plan = None
+        self.write_plan_key = None
+        self.prefetcher = Prefetcher()
+        # Las entregas cambian mientras el profesor corrige en Canvas: solo se reutilizan unos segundos.
+        self.grades_prefetcher = Prefetcher(max_workers=PREFETCH_RECENT_ASSIGNMENTS or 1, ttl=PREFETCH_GRADES_TTL)
+        self.report_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='informes')
+        # Con un servicio local configurado, Canvas y el procesador se usan a través de él
+        self.service = ServiceClient(SERVICE_URL) if SERVICE_URL else None
+        self.service_selection = None
 
         self._create_widgets()
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
+        self._start_background_prefetch()
 
     def _create_widgets(self):
         main_frame = ttk.Frame(self, padding="20");
@@ -65,6 +87,9 @@ class MainApp(tk.Tk):
         ttk.Radiobutton(source_chooser_frame, text="Google Sheets", variable=self.source_type, value="sheets",
                         command=self._on_source_change).pack(side="left", padx=5)
 
+        ttk.Checkbutton(dest_frame, text="Varias pestañas de grupo en el mismo libro", variable=self.multi_tab,
+                        command=self._on_multi_tab_change).pack(anchor="w")
+
         self.excel_controls_frame = ttk.Frame(dest_frame)
         self.btn_load_excel = ttk.Button(self.excel_controls_frame, text="Seleccionar Plantilla Excel",
                                          command=self._select_excel_file);
@@ -80,6 +105,10 @@ class MainApp(tk.Tk):
 
         action_frame = ttk.LabelFrame(main_frame, text="Paso 3: Ejecutar", padding="10");
         action_frame.pack(fill="x", pady=20)
+        ttk.Label(action_frame, text="Pestaña de Destino:").pack(anchor="w")
+        self.combo_pestana = ttk.Combobox(action_frame, state="disabled", exportselection=False);
+        self.combo_pestana.pack(fill="x", pady=2)
+        self.combo_pestana.bind("<<ComboboxSelected>>", self._on_pestana_selected)
         ttk.Label(action_frame, text="Trimestre de Destino:").pack(anchor="w")
         self.combo_trimestre = ttk.Combobox(action_frame, state="disabled", exportselection=False);
         self.combo_trimestre.pack(fill="x", pady=2)
@@ -88,9 +117,33 @@ class MainApp(tk.Tk):
         self.combo_excel_tareas = ttk.Combobox(action_frame, state="disabled", exportselection=False);
         self.combo_excel_tareas.pack(fill="x", pady=2)
 
+        self.btn_previsualizar = ttk.Button(action_frame, text="Previsualizar Cambios",
+                                            command=self._preview_write_plan, state="disabled");
+        self.btn_previsualizar.pack(fill="x", pady=(10, 0))
+
         self.btn_escribir = ttk.Button(action_frame, text="Cotejar y Escribir Todas las Notas",
                                        command=self._execute_full_write, state="disabled");
         self.btn_escribir.pack(fill="x", ipady=10, pady=10)
+        ttk.Checkbutton(action_frame, text="Recalcular las notas de trimestre al guardar (Excel)",
+                        variable=self.recalculate_aggregates).pack(anchor="w", pady=(0, 5))
+
+        self.batch_frame = ttk.Frame(action_frame)
+        self.btn_add_route = ttk.Button(self.batch_frame, text="Añadir Curso al Lote", command=self._add_sync_route);
+        self.btn_add_route.pack(side="left", fill="x", expand=True, padx=(0, 5))
+        self.btn_write_batch = ttk.Button(self.batch_frame, text="Escribir Lote", command=self._execute_batch_write,
+                                          state="disabled");
+        self.btn_write_batch.pack(side="left", fill="x", expand=True, padx=(0, 5))
+        ttk.Button(self.batch_frame, text="Vaciar Lote", command=self._clear_sync_routes).pack(side="left")
+        self.label_batch = ttk.Label(action_frame, text="")
+
+        self.reports_frame = ttk.Frame(action_frame)
+        self.reports_frame.pack(fill="x", pady=(5, 0))
+        self.btn_report_students = ttk.Button(self.reports_frame, text="Informes por Alumno", state="disabled",
+                                              command=lambda: self._generate_reports(reports.KIND_STUDENT));
+        self.btn_report_students.pack(side="left", fill="x", expand=True, padx=(0, 5))
+        self.btn_report_groups = ttk.Button(self.reports_frame, text="Informes por Grupo", state="disabled",
+                                            command=lambda: self._generate_reports(reports.KIND_GROUP));
+        self.btn_report_groups.pack(side="left", fill="x", expand=True)
 
         self._on_source_change()
 
@@ -104,11 +157,54 @@ class MainApp(tk.Tk):
             self.sheets_controls_frame.pack(fill="x")
         self._check_if_ready_to_write()
 
+    def _on_close(self):
+        self.prefetcher.shutdown()
+        self.grades_prefetcher.shutdown()
+        self.report_executor.shutdown(wait=False)
+        self.destroy()
+
+    def _start_background_prefetch(self):
+        """Carga en segundo plano la lista de cursos (desde la caché si está vigente) y las tareas de cada curso."""
+        if self.service is not None:
+            self._when_done(self.prefetcher.prefetch('cursos', self.service.courses), self._on_courses_prefetched)
+            return
+        if not clients.canvas:
+            return
+        future = self.prefetcher.prefetch('cursos', clients.obtener_cursos)
+        self._when_done(future, self._on_courses_prefetched)
+
+    def _when_done(self, future, callback):
+        """Llama a `callback(future)` en el hilo de Tk cuando termine el trabajo en segundo plano."""
+        if future.done():
+            callback(future)
+        else:
+            self.after(100, self._when_done, future, callback)
+
+    def _on_courses_prefetched(self, future):
+        try:
+            cursos = future.result()
+        except Exception as e:
+            logging.warning("No se pudo cargar la lista de cursos en segundo plano: %s", e)
+            return
+        if not self.cursos_canvas_dict:
+            self._set_courses(cursos)
+        if self.service is not None:
+            return
+        for curso_id in cursos.values():
+            self.prefetcher.prefetch(('tareas', curso_id), clients.obtener_tareas_detalle, curso_id)
+            self.prefetcher.prefetch(('alumnos', curso_id), clients.obtener_alumnos, curso_id)
+
+    def _set_courses(self, cursos):
+        self.cursos_canvas_dict = cursos
+        self.combo_canvas_cursos['values'] = list(self.cursos_canvas_dict.keys())
+        self.combo_canvas_cursos.config(state="readonly")
+
     def _load_canvas_courses(self):
         try:
-            self.cursos_canvas_dict = clients.obtener_cursos()
-            self.combo_canvas_cursos['values'] = list(self.cursos_canvas_dict.keys())
-            self.combo_canvas_cursos.config(state="readonly")
+            if self.service is not None:
+                self._set_courses(self.service.courses())
+            else:
+                self._set_courses(clients.obtener_cursos(use_cache=False))
             messagebox.showinfo("Éxito", f"Se cargaron {len(self.cursos_canvas_dict)} cursos.")
         except Exception as e:
             messagebox.showerror("Error de Conexión", f"No se pudo conectar a Canvas: {e}")
@@ -117,9 +213,18 @@ class MainApp(tk.Tk):
         nombre_curso = self.combo_canvas_cursos.get()
         if not nombre_curso: return
         curso_id = self.cursos_canvas_dict[nombre_curso]
+        if self.service is not None:
+            self._on_course_selected_via_service(curso_id)
+            return
         try:
-            self.df_alumnos_del_curso = clients.obtener_alumnos(curso_id)
-            self.tareas_canvas_dict = clients.obtener_tareas(curso_id)
+            # Si la descarga adelantada aún no ha empezado, alumnos y tareas se piden a la vez.
+            self.prefetcher.prefetch(('alumnos', curso_id), clients.obtener_alumnos, curso_id)
+            tareas = self.prefetcher.get(('tareas', curso_id), clients.obtener_tareas_detalle, curso_id)
+            self.df_alumnos_del_curso = self.prefetcher.get(('alumnos', curso_id), clients.obtener_alumnos, curso_id)
+            self.tareas_canvas_dict = {tarea['name']: tarea['id'] for tarea in tareas}
+            for tarea in tareas[:PREFETCH_RECENT_ASSIGNMENTS]:
+                self.grades_prefetcher.prefetch(('notas', curso_id, tarea['id']), clients.obtener_calificaciones,
+                                                curso_id, tarea['id'])
             self.combo_canvas_tareas['values'] = list(self.tareas_canvas_dict.keys())
             self.combo_canvas_tareas.config(state="readonly")
             messagebox.showinfo("Curso Seleccionado",
@@ -127,27 +232,38 @@ class MainApp(tk.Tk):
         except Exception as e:
             messagebox.showerror("Error", f"No se pudieron cargar datos del curso: {e}")
 
+    def _on_course_selected_via_service(self, curso_id):
+        try:
+            tareas = self.service.assignments(curso_id)
+            self.tareas_canvas_dict = {tarea['name']: tarea['id'] for tarea in tareas}
+            self.combo_canvas_tareas['values'] = list(self.tareas_canvas_dict.keys())
+            self.combo_canvas_tareas.config(state="readonly")
+        except Exception as e:
+            messagebox.showerror("Error", f"No se pudieron cargar las tareas desde el servicio: {e}")
+
     def _on_canvas_task_selected(self, event=None):
         nombre_curso = self.combo_canvas_cursos.get()
         nombre_tarea = self.combo_canvas_tareas.get()
+        if self.service is not None:
+            # El servicio descarga las notas al procesar el trabajo; aquí solo se recuerda la selección.
+            if nombre_curso and nombre_tarea:
+                self.service_selection = {
+                    'course_id': self.cursos_canvas_dict[nombre_curso], 'course_name': nombre_curso,
+                    'assignment_id': self.tareas_canvas_dict[nombre_tarea], 'assignment_name': nombre_tarea,
+                }
+                self._check_if_ready_to_write()
+            return
         if not all([nombre_curso, nombre_tarea, self.df_alumnos_del_curso is not None]): return
         curso_id = self.cursos_canvas_dict[nombre_curso]
         tarea_id = self.tareas_canvas_dict[nombre_tarea]
         try:
-            df_calificaciones = clients.obtener_calificaciones(curso_id, tarea_id)
-            df_alumnos_renamed = self.df_alumnos_del_curso.rename(columns={'id': 'user_id'})
-            df_final = pd.merge(df_calificaciones, df_alumnos_renamed, on='user_id', how='right')
-            df_final.dropna(subset=['name'], inplace=True)
-
-            def round_score(score):
-                try:
-                    return round(float(score), 1)
-                except (ValueError, TypeError):
-                    return score
-
-            df_final['score'] = df_final['score'].apply(round_score)
-            df_final.to_json("canvas_grades_to_write.json", orient='records', indent=4, force_ascii=False)
-            logging.info(f"Guardadas {len(df_final)} notas en 'canvas_grades_to_write.json'.")
+            df_calificaciones = self.grades_prefetcher.get(('notas', curso_id, tarea_id),
+                                                           clients.obtener_calificaciones, curso_id, tarea_id)
+            self.grades_prefetcher.invalidate(('notas', curso_id, tarea_id))
+            df_final = processor.fetch_canvas_grades(curso_id, tarea_id, self.df_alumnos_del_curso,
+                                                     course_name=nombre_curso, assignment_name=nombre_tarea,
+                                                     df_calificaciones=df_calificaciones)
+            processor.save_grades_to_write(df_final)
             messagebox.showinfo("Notas de Canvas Guardadas", f"Se han extraído y guardado {len(df_final)} notas.")
             self._check_if_ready_to_write()
         except Exception as e:
@@ -162,9 +278,16 @@ class MainApp(tk.Tk):
     def _refresh_excel_data(self, path):
         self.excel_file_path = path
         try:
-            workbook = openpyxl.load_workbook(path, data_only=True)
-            self.trimester_data_map = mapping.build_map_from_excel(workbook)
-            self._update_dest_combos()
+            if self.service is not None:
+                dest_maps = self.service.destination_maps({'type': 'excel', 'path': path,
+                                                           'all_tabs': self.multi_tab.get()})
+                self._set_dest_maps(dest_maps, mapping.DEFAULT_SHEET_NAME)
+                messagebox.showinfo("Excel Cargado", "Archivo Excel mapeado por el servicio.")
+                return
+            if self.excel_session is not None:
+                self.excel_session.close()
+            self.excel_session = WorkbookSession(path, all_tabs=self.multi_tab.get())
+            self._set_dest_maps(self.excel_session.maps, self.excel_session.sheet_name)
             messagebox.showinfo("Excel Cargado", "Archivo Excel cargado y mapeado.")
         except Exception as e:
             messagebox.showerror("Error al leer Excel", f"No se pudo procesar el archivo Excel:\n{e}")
@@ -176,9 +299,13 @@ class MainApp(tk.Tk):
         if not spreadsheet_id: messagebox.showerror("URL Inválida", "La URL no parece ser válida."); return
         self.spreadsheet_id = spreadsheet_id
         try:
-            sheet_data = clients.get_gsheet_values(self.spreadsheet_id, "EVALUACIÓN")
-            self.trimester_data_map = mapping.build_map_from_gsheet_data(sheet_data)
-            self._update_dest_combos()
+            if self.service is not None:
+                dest_maps = self.service.destination_maps({'type': 'sheets', 'id': self.spreadsheet_id,
+                                                           'all_tabs': self.multi_tab.get()})
+            else:
+                self.gsheet_session = SheetsSession(self.spreadsheet_id, all_tabs=self.multi_tab.get())
+                dest_maps = self.gsheet_session.maps
+            self._set_dest_maps(dest_maps, mapping.DEFAULT_SHEET_NAME)
             messagebox.showinfo("Google Sheet Cargado", "Hoja de Google cargada y mapeada.")
         except Exception as e:
             messagebox.showerror("Error al Cargar", f"No se pudo cargar o procesar la hoja de Google:\n{e}")
@@ -187,6 +314,37 @@ class MainApp(tk.Tk):
         match = re.search(r"/spreadsheets/d/([a-zA-Z0-9-_]+)", url)
         return match.group(1) if match else None
 
+    def _on_multi_tab_change(self):
+        if self.multi_tab.get():
+            self.batch_frame.pack(fill="x", before=self.reports_frame)
+            self.label_batch.pack(anchor="w", pady=(5, 0), before=self.reports_frame)
+        else:
+            self.batch_frame.pack_forget()
+            self.label_batch.pack_forget()
+            self._clear_sync_routes()
+        if self.source_type.get() == 'excel' and self.excel_file_path:
+            self._refresh_excel_data(self.excel_file_path)
+        elif self.source_type.get() == 'sheets' and self.spreadsheet_id:
+            self._load_google_sheet()
+
+    def _set_dest_maps(self, dest_maps, active_sheet):
+        self.dest_maps = dest_maps
+        sheet_names = list(dest_maps)
+        if active_sheet not in dest_maps:
+            active_sheet = sheet_names[0]
+        self.combo_pestana['values'] = sheet_names
+        self.combo_pestana.set(active_sheet)
+        self.combo_pestana.config(state="readonly" if len(sheet_names) > 1 else "disabled")
+        self._on_pestana_selected()
+
+    def _on_pestana_selected(self, event=None):
+        sheet_name = self.combo_pestana.get()
+        if sheet_name not in self.dest_maps: return
+        self.trimester_data_map = self.dest_maps[sheet_name]
+        if self.excel_session is not None and sheet_name in self.excel_session.maps:
+            self.excel_session.sheet_name = sheet_name
+        self._update_dest_combos()
+
     def _update_dest_combos(self):
         trimestre_names = [t['trimestre_name'] for t in self.trimester_data_map]
         self.combo_trimestre['values'] = trimestre_names
@@ -209,38 +367,246 @@ class MainApp(tk.Tk):
             self.combo_excel_tareas.config(state="disabled")
         self._check_if_ready_to_write()
 
-    def _execute_full_write(self):
-        dest_config = {
+    def _dest_session(self):
+        """Sesión ya cargada del destino elegido, compartida por el mapeo, el cotejo y la escritura."""
+        return self.excel_session if self.source_type.get() == 'excel' else self.gsheet_session
+
+    def _current_dest_config(self):
+        return {
             'type': self.source_type.get(),
             'trimestre': self.combo_trimestre.get(),
             'tarea': self.combo_excel_tareas.get(),
+            'sheet_name': self.combo_pestana.get() or mapping.DEFAULT_SHEET_NAME,
             'path': self.excel_file_path,
             'id': self.spreadsheet_id
         }
+
+    def _get_write_plan(self):
+        """Devuelve el plan de escritura en caché o lo calcula si ha cambiado algo."""
+        dest_config = self._current_dest_config()
+        if self.service is not None:
+            result = self.service.run(dict(self.service_selection, dest=dest_config, apply=False))
+            self.write_plan = WritePlan.from_dict(result['plan'])
+            self.write_plan.save()
+            return self.write_plan
+        key = (tuple(sorted(dest_config.items())), os.path.getmtime(processor.GRADES_FILE))
+        session = self._dest_session()
+        session_stale = session is not None and session.is_stale()
+        if self.write_plan is None or self.write_plan_key != key or session_stale:
+            self.write_plan = processor.build_write_plan(dest_config, session=session)
+            self.write_plan.save()
+            self.write_plan_key = key
+        return self.write_plan
+
+    def _preview_write_plan(self):
+        try:
+            plan = self._get_write_plan()
+        except Exception as e:
+            logging.error("No se pudo calcular el plan de escritura: %s", e, exc_info=True)
+            messagebox.showerror("Error en el Proceso", f"Ha ocurrido un error:\n{e}")
+            return
+        PlanPreviewWindow(self, [plan], on_apply=self._apply_write_plans)
+
+    def _execute_full_write(self):
+        try:
+            plan = self._get_write_plan()
+        except Exception as e:
+            logging.error("Fallo en el proceso principal de escritura: %s", e, exc_info=True)
+            messagebox.showerror("Error en el Proceso", f"Ha ocurrido un error:\n{e}")
+            return
+        self._apply_write_plans([plan])
+
+    def _add_sync_route(self):
+        """Añade al lote las notas de Canvas actuales con la pestaña, trimestre y tarea elegidos."""
+        dest_config = self._current_dest_config()
+        if not os.path.exists(processor.GRADES_FILE) or not dest_config['tarea']:
+            messagebox.showwarning("Lote", "Selecciona una tarea de Canvas y una tarea de destino.")
+            return
+        with open(processor.GRADES_FILE, 'r', encoding='utf-8') as f:
+            grades = json.load(f)
+        self.sync_routes.append({
+            'label': self.combo_canvas_cursos.get(),
+            'sheet_name': dest_config['sheet_name'],
+            'trimestre': dest_config['trimestre'],
+            'tarea': dest_config['tarea'],
+            'grades': grades,
+        })
+        self._update_batch_label()
+
+    def _clear_sync_routes(self):
+        self.sync_routes = []
+        self._update_batch_label()
+
+    def _update_batch_label(self):
+        lines = [f"{r['label']} → {r['sheet_name']} / {r['trimestre']} / {r['tarea']}" for r in self.sync_routes]
+        self.label_batch.config(text="\n".join(lines))
+        self.btn_write_batch.config(state="normal" if self.sync_routes else "disabled")
+
+    def _execute_batch_write(self):
+        try:
+            plans = processor.build_write_plans(self._current_dest_config(), self.sync_routes, session=self._dest_session())
+        except Exception as e:
+            logging.error("No se pudo calcular el plan de escritura del lote: %s", e, exc_info=True)
+            messagebox.showerror("Error en el Proceso", f"Ha ocurrido un error:\n{e}")
+            return
+        PlanPreviewWindow(self, plans, on_apply=self._apply_write_plans)
+
+    def _apply_write_plans(self, plans):
         try:
-            result = processor.run_grade_processing(dest_config)
+            if self.service is not None:
+                result = self._apply_write_plans_via_service(plans)
+            else:
+                result = processor.apply_write_plans(plans, session=self._dest_session(),
+                                                     recalculate=self.recalculate_aggregates.get())
+            self.write_plan = None
+            if len(plans) > 1:
+                self._clear_sync_routes()
             summary_message = (
                 f"Proceso completado.\n\n"
                 f"Alumnos de Canvas procesados: {result['processed']}\n"
                 f"Notas escritas con éxito: {result['written']}\n"
+                f"Notas sin cambios: {result['unchanged']}\n"
                 f"Alumnos no encontrados: {result['not_found']}"
             )
+            if result.get('recalculated'):
+                summary_message += f"\nNotas de trimestre recalculadas: {result['recalculated']}"
+            if result.get('formula_cells'):
+                summary_message += (f"\nNotas de trimestre con fórmula ({result['formula_cells']}): no se pueden "
+                                    f"escribir; Excel las recalculará al abrir el archivo.")
             if result.get('backup_path'):
                 summary_message += f"\n\nCopia de seguridad creada en:\n{os.path.basename(result['backup_path'])}"
             if result['not_found'] > 0:
                 summary_message += "\n\nConsulta 'app.log' para ver los nombres de los alumnos no encontrados."
             messagebox.showinfo("Resumen de la Operación", summary_message)
-            if dest_config['type'] == 'excel':
-                self._refresh_excel_data(self.excel_file_path)
+            if plans[0].dest_type == 'excel' and self.excel_session is not None:
+                self.excel_session.ensure_fresh()
+                self.dest_maps = self.excel_session.maps
+                self.trimester_data_map = self.dest_maps.get(self.combo_pestana.get(), self.trimester_data_map)
         except Exception as e:
-            logging.error(f"Fallo en el proceso principal de escritura: {e}", exc_info=True)
+            logging.error("Fallo en el proceso principal de escritura: %s", e, exc_info=True)
             messagebox.showerror("Error en el Proceso", f"Ha ocurrido un error:\n{e}")
 
+    def _apply_write_plans_via_service(self, plans):
+        """
+        Envía los planes ya revisados al servicio en un solo trabajo, que los
+        aplica con un único guardado (`apply_write_plans`) como en local.
+        """
+        return self.service.run({'plans': [plan.to_dict() for plan in plans],
+                                 'recalculate': self.recalculate_aggregates.get()})['result']
+
+    def _generate_reports(self, kind):
+        """Lee las notas de todas las pestañas cargadas y genera los informes en segundo plano."""
+        session = self._dest_session()
+        if session is None: return
+        out_dir = filedialog.askdirectory(title="Carpeta para los informes")
+        if not out_dir: return
+        try:
+            book = reports.read_grade_book(session)
+        except Exception as e:
+            logging.error("No se pudieron leer las notas para los informes: %s", e, exc_info=True)
+            messagebox.showerror("Error en los Informes", f"Ha ocurrido un error:\n{e}")
+            return
+        future = self.report_executor.submit(reports.generate_reports, book, kind, out_dir)
+        self._when_done(future, lambda done: self._on_reports_generated(done, out_dir))
+
+    def _on_reports_generated(self, future, out_dir):
+        try:
+            paths = future.result()
+        except Exception as e:
+            logging.error("Fallo al generar los informes: %s", e, exc_info=True)
+            messagebox.showerror("Error en los Informes", f"Ha ocurrido un error:\n{e}")
+            return
+        messagebox.showinfo("Informes Generados", f"Se han generado {len(paths)} informes en:\n{out_dir}")
+
     def _check_if_ready_to_write(self):
-        canvas_ready = os.path.exists("canvas_grades_to_write.json")
+        canvas_ready = os.path.exists(processor.GRADES_FILE)
+        if self.service is not None:
+            canvas_ready = self.service_selection is not None
         dest_excel_ready = self.source_type.get() == 'excel' and self.excel_file_path
         dest_gsheet_ready = self.source_type.get() == 'sheets' and self.spreadsheet_id
         if canvas_ready and (dest_excel_ready or dest_gsheet_ready):
             self.btn_escribir.config(state="normal")
+            self.btn_previsualizar.config(state="normal")
+        else:
+            self.btn_escribir.config(state="disabled")
+            self.btn_previsualizar.config(state="disabled")
+        reports_ready = self.service is None and self._dest_session() is not None
+        for button in (self.btn_report_students, self.btn_report_groups):
+            button.config(state="normal" if reports_ready else "disabled")
+
+
+class PlanPreviewWindow(tk.Toplevel):
+    """Ventana con la tabla de celdas que cambiarán; las columnas se ordenan al pulsar el encabezado."""
+
+    COLUMNS = [
+        ('sheet_name', "Pestaña", 110),
+        ('cell', "Celda", 60),
+        ('student_name', "Alumno (Canvas)", 210),
+        ('matched_name', "Alumno (Hoja)", 210),
+        ('old_value', "Valor actual", 85),
+        ('new_value', "Valor nuevo", 85),
+        ('confidence', "Confianza", 75),
+        ('origin', "Origen", 75),
+    ]
+
+    def __init__(self, master, plans, on_apply):
+        super().__init__(master)
+        self.plans = plans
+        self.on_apply = on_apply
+        if len(plans) == 1:
+            plan = plans[0]
+            self.title(f"Plan de escritura: {plan.trimestre} / {plan.tarea} (columna {plan.column})")
         else:
-            self.btn_escribir.config(state="disabled")
\ No newline at end of file
+            self.title(f"Plan de escritura: {len(plans)} cursos")
+        self.geometry("1020x450")
+        self._sort_reverse = {}
+
+        pending = [(plan, entry) for plan in plans for entry in plan.pending]
+        total_entries = sum(len(plan.entries) for plan in plans)
+        not_found = sum(len(plan.not_found_names) for plan in plans)
+
+        frame = ttk.Frame(self, padding="10")
+        frame.pack(fill="both", expand=True)
+
+        ttk.Label(frame, text=(
+            f"Celdas con cambios: {len(pending)}  |  Sin cambios: {total_entries - len(pending)}  |  "
+            f"Alumnos no encontrados: {not_found}"
+        )).pack(anchor="w", pady=(0, 5))
+
+        self.tree = ttk.Treeview(frame, columns=[c[0] for c in self.COLUMNS], show="headings")
+        for key, heading, width in self.COLUMNS:
+            self.tree.heading(key, text=heading, command=lambda k=key: self._sort_by(k))
+            self.tree.column(key, width=width, anchor="w")
+        scrollbar = ttk.Scrollbar(frame, orient="vertical", command=self.tree.yview)
+        self.tree.configure(yscrollcommand=scrollbar.set)
+        self.tree.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="left", fill="y")
+
+        for plan, entry in pending:
+            values = [plan.sheet_name]
+            values += ['' if getattr(entry, key) is None else getattr(entry, key) for key, _, _ in self.COLUMNS[1:]]
+            self.tree.insert("", "end", values=values)
+
+        buttons = ttk.Frame(self, padding="10")
+        buttons.pack(fill="x")
+        ttk.Button(buttons, text="Aplicar Cambios", command=self._apply,
+                   state="normal" if pending else "disabled").pack(side="right", padx=5)
+        ttk.Button(buttons, text="Cerrar", command=self.destroy).pack(side="right")
+
+    def _sort_by(self, key):
+        def sort_value(item_id):
+            value = self.tree.set(item_id, key)
+            try:
+                return 0, float(value)
+            except ValueError:
+                return 1, value.lower()
+
+        reverse = self._sort_reverse.get(key, False)
+        items = sorted(self.tree.get_children(""), key=sort_value, reverse=reverse)
+        for index, item_id in enumerate(items):
+            self.tree.move(item_id, "", index)
+        self._sort_reverse[key] = not reverse
+
+    def _apply(self):
+        self.destroy()
+        self.on_apply(self.plans)
@@ -0,0 +1,232 @@
+# evaluator/identity.py
+"""
+Mapa persistente de identidades: `user_id` de Canvas → fila de la hoja de destino.
+
+Una vez que un cotejo se confirma (el plan se aplica), la fila del alumno se
+guarda junto con un hash de su nombre en la hoja y la confianza del cotejo. En
+las siguientes ejecuciones se busca por `user_id` en O(1), con esa misma
+confianza para que los cotejos dudosos sigan marcándose en la vista previa, y
+solo se recurre al cotejo de nombres para los alumnos nuevos o para las filas
+cuyo nombre ha cambiado. Si cambia la columna
+de nombres, se descartan automáticamente las entradas cuyas filas ya no
+coinciden.
+
+Las correcciones manuales asocian un `user_id` al nombre tal como aparece en la
+hoja, así que sobreviven aunque el alumno cambie de fila:
+
+    python -m evaluator.identity override "plantilla.xlsx::EVALUACIÓN" 12345 "García López, María José"
+    python -m evaluator.identity list
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from . import matcher
+
+IDENTITY_FILE = 'identity_map.json'
+
+ORIGIN_MATCHER = 'cotejo'
+ORIGIN_IDENTITY = 'identidad'
+ORIGIN_OVERRIDE = 'manual'
+
+
+def destination_key(target: str, sheet_name: str) -> str:
+    """Clave de un destino: ruta del Excel o ID de la hoja de Google, más la pestaña."""
+    return f"{target}::{sheet_name}"
+
+
+def name_hash(name) -> str:
+    return hashlib.sha1(matcher.normalize_name(str(name)).encode('utf-8')).hexdigest()[:16]
+
+
+def roster_hash(roster_index: list) -> str:
+    digest = hashlib.sha1()
+    for row, name, _, _ in sorted(roster_index, key=lambda item: item[0]):
+        digest.update(f"{row}:{matcher.normalize_name(name)}\n".encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def _user_key(user_id) -> str | None:
+    try:
+        return str(int(user_id))
+    except (TypeError, ValueError):
+        return None
+
+
+class IdentityResolver:
+    """Vista de un destino concreto con su lista de alumnos actual, lista para buscar por `user_id`."""
+
+    def __init__(self, entry: dict, roster_index: list):
+        self._entry = entry
+        self._rows = {row: name for row, name, _, _ in roster_index}
+        self._rows_by_name = {}
+        for row, name, _, _ in roster_index:
+            self._rows_by_name.setdefault(matcher.normalize_name(name), row)
+
+    def lookup(self, user_id):
+        """Devuelve (fila, confianza, origen) o None si hay que recurrir al cotejo de nombres."""
+        key = _user_key(user_id)
+        if key is None:
+            return None
+        override = self._entry['overrides'].get(key)
+        if override:
+            row = self._rows_by_name.get(matcher.normalize_name(override))
+            if row:
+                return row, 1.0, ORIGIN_OVERRIDE
+            logging.warning("La corrección manual del alumno %s ('%s') no está en la hoja.", key, override)
+        known = self._entry['rows'].get(key)
+        # Las entradas guardadas sin confianza se vuelven a cotejar para no darlas por seguras.
+        if (known and 'confidence' in known and known['row'] in self._rows
+                and name_hash(self._rows[known['row']]) == known['name_hash']):
+            return known['row'], known['confidence'], ORIGIN_IDENTITY
+        return None
+
+
+# Varios `IdentityMap` del mismo proceso (p. ej. sincronizaciones simultáneas del
+# servicio) escriben el mismo archivo: se guardan de uno en uno.
+_SAVE_LOCK = threading.Lock()
+
+
+def _new_entry(destinations: dict, dest_key: str) -> dict:
+    return destinations.setdefault(dest_key, {'roster_hash': None, 'rows': {}, 'overrides': {}})
+
+
+def _refresh_roster(entry: dict, rows: dict, current_hash: str) -> int:
+    """
+    Descarta las identidades cuyas filas ya no coinciden con la lista `rows` y
+    apunta su hash. Devuelve cuántas se han descartado.
+    """
+    before = len(entry['rows'])
+    entry['rows'] = {
+        uid: known for uid, known in entry['rows'].items()
+        if known['row'] in rows and name_hash(rows[known['row']]) == known['name_hash']
+    }
+    entry['roster_hash'] = current_hash
+    return before - len(entry['rows'])
+
+
+def _confirm(entry: dict, key: str, known: dict):
+    entry['rows'][key] = known
+
+
+def _set_override(entry: dict, key: str, sheet_name_value: str):
+    entry['overrides'][key] = sheet_name_value
+
+
+def _remove_override(entry: dict, key: str):
+    entry['overrides'].pop(key, None)
+
+
+class IdentityMap:
+    """
+    Almacén en JSON de `{destino: {'roster_hash', 'rows': {user_id: {row, name_hash, confidence}}, 'overrides'}}`.
+
+    Los cambios se anotan además de aplicarse en memoria; al guardar se vuelve a
+    leer el archivo y se aplican encima, de modo que no se pierden los que haya
+    guardado otra instancia mientras tanto.
+    """
+
+    def __init__(self, path: str = IDENTITY_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._changes = []
+        self.destinations = self._read()
+
+    def _read(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning("No se pudo leer el mapa de identidades '%s': %s. Se empieza de cero.", self.path, e)
+            return {}
+
+    def _change(self, dest_key: str, apply, *args):
+        """Aplica un cambio a `destinations` y lo anota para repetirlo al guardar. Se llama con el cerrojo."""
+        self._changes.append((dest_key, apply, args))
+        return apply(_new_entry(self.destinations, dest_key), *args)
+
+    def resolver(self, dest_key: str, roster_index: list) -> IdentityResolver:
+        """
+        Prepara la búsqueda para un destino. Si la columna de nombres ha cambiado
+        desde la última vez, descarta las entradas cuyas filas ya no coinciden.
+        """
+        with self._lock:
+            current_hash = roster_hash(roster_index)
+            entry = _new_entry(self.destinations, dest_key)
+            # Un destino sin identidades no tiene nada que descartar: así no se guarda el archivo en cada plan.
+            if entry['rows'] and entry['roster_hash'] != current_hash:
+                rows = {row: name for row, name, _, _ in roster_index}
+                discarded = self._change(dest_key, _refresh_roster, rows, current_hash)
+                if discarded:
+                    logging.info("La lista de alumnos de '%s' ha cambiado: %d identidades descartadas.",
+                                 dest_key, discarded)
+            return IdentityResolver(entry, roster_index)
+
+    def confirm(self, dest_key: str, user_id, row: int, sheet_name_value, confidence: float = 1.0):
+        key = _user_key(user_id)
+        if key is None or not sheet_name_value:
+            return
+        with self._lock:
+            self._change(dest_key, _confirm, key, {'row': row, 'name_hash': name_hash(sheet_name_value),
+                                                   'confidence': confidence})
+
+    def set_override(self, dest_key: str, user_id, sheet_name_value: str):
+        with self._lock:
+            self._change(dest_key, _set_override, str(user_id), sheet_name_value)
+
+    def remove_override(self, dest_key: str, user_id):
+        with self._lock:
+            self._change(dest_key, _remove_override, str(user_id))
+
+    def save(self):
+        """Guarda los cambios anotados sobre lo que haya en disco. Sin cambios no toca el archivo."""
+        with _SAVE_LOCK, self._lock:
+            if not self._changes:
+                return
+            destinations = self._read()
+            for dest_key, apply, args in self._changes:
+                apply(_new_entry(destinations, dest_key), *args)
+            # Cada hilo usa su propio temporal, por si otro proceso guarda a la vez.
+            tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(destinations, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+            self.destinations, self._changes = destinations, []
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gestiona el mapa de identidades Canvas → fila de la hoja.")
+    parser.add_argument('--file', default=IDENTITY_FILE)
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list', help="Muestra los destinos y sus identidades")
+    override = sub.add_parser('override', help="Asocia un user_id de Canvas a un nombre de la hoja")
+    override.add_argument('destination', help="Clave del destino: '<ruta o ID>::<pestaña>'")
+    override.add_argument('user_id')
+    override.add_argument('name', help="Nombre del alumno tal como aparece en la hoja")
+    remove = sub.add_parser('remove-override', help="Elimina una corrección manual")
+    remove.add_argument('destination')
+    remove.add_argument('user_id')
+    args = parser.parse_args(argv)
+
+    identity = IdentityMap(args.file)
+    if args.command == 'list':
+        for dest_key, entry in identity.destinations.items():
+            print(f"{dest_key}: {len(entry['rows'])} identidades, {len(entry['overrides'])} correcciones manuales")
+            for uid, name in entry['overrides'].items():
+                print(f"    {uid} → {name}")
+        return
+    if args.command == 'override':
+        identity.set_override(args.destination, args.user_id, args.name)
+    else:
+        identity.remove_override(args.destination, args.user_id)
+    identity.save()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,9 +4,12 @@ import re
 import openpyxl.utils
 import logging
 
+DEFAULT_SHEET_NAME = 'EVALUACIÓN'
+
 
 def _build_map_logic(sheet, header_ranges, activity_row):
     pattern = re.compile(r"(TAREA|ACTIVIDAD)\s*(\d+)", re.IGNORECASE)
+    grade_pattern = re.compile(r"\bNOTA\b", re.IGNORECASE)
     trimester_map = []
     trimestre_labels = ["1er Trimestre", "2do Trimestre", "3er Trimestre"]
 
@@ -15,6 +18,7 @@ def _build_map_logic(sheet, header_ranges, activity_row):
         max_col = header_range.max_col if hasattr(header_range, 'max_col') else header_range['max_col']
 
         current_trimester_tasks = {}
+        grade_column = None
         for col_idx in range(min_col, max_col + 1):
             cell = sheet.cell(row=activity_row, column=col_idx)
             if cell and cell.value:
@@ -23,22 +27,29 @@ def _build_map_logic(sheet, header_ranges, activity_row):
                     task_name = f"TAREA {match.group(2)}"
                     col_letter = openpyxl.utils.get_column_letter(col_idx)
                     current_trimester_tasks[task_name] = col_letter
+                elif grade_column is None and grade_pattern.search(str(cell.value)) \
+                        and 'FINAL' not in str(cell.value).upper():
+                    # Columna con la nota del trimestre (en la plantilla, una fórmula sobre sus tareas)
+                    grade_column = openpyxl.utils.get_column_letter(col_idx)
 
         if current_trimester_tasks:
             trimestre_name = trimestre_labels[i] if i < len(trimestre_labels) else f"{i + 1}to Trimestre"
-            trimester_map.append({
+            trimester_info = {
                 'trimestre_name': trimestre_name,
                 'tasks': current_trimester_tasks
-            })
+            }
+            if grade_column:
+                trimester_info['grade_column'] = grade_column
+            trimester_map.append(trimester_info)
 
     if not trimester_map:
         raise ValueError("No se encontraron actividades con el formato 'TAREA X' en ningún trimestre.")
 
-    logging.info(f"Mapa de actividades construido con éxito: {trimester_map}")
+    logging.info("Mapa de actividades construido con éxito: %s", trimester_map)
     return trimester_map
 
 
-def build_map_from_excel(workbook, sheet_name='EVALUACIÓN', header_text="RESULTADO APRENDIZAJE", activity_row=9):
+def build_map_from_excel(workbook, sheet_name=DEFAULT_SHEET_NAME, header_text="RESULTADO APRENDIZAJE", activity_row=9):
     try:
         sheet = workbook[sheet_name]
     except KeyError:
@@ -89,4 +100,33 @@ def build_map_from_gsheet_data(data, header_text="RESULTADO APRENDIZAJE", activi
             except IndexError:
                 return MockCell(None)
 
-    return _build_map_logic(MockSheet(), header_ranges, activity_row)
\ No newline at end of file
+    return _build_map_logic(MockSheet(), header_ranges, activity_row)
+
+
+def discover_excel_template_sheets(workbook, header_text="RESULTADO APRENDIZAJE", activity_row=9) -> dict:
+    """
+    Recorre todas las pestañas del libro y devuelve `{nombre_pestaña: trimester_map}`
+    para las que siguen el formato de la plantilla de evaluación.
+    """
+    maps = {}
+    for sheet_name in workbook.sheetnames:
+        try:
+            maps[sheet_name] = build_map_from_excel(workbook, sheet_name, header_text, activity_row)
+        except ValueError:
+            continue
+    if not maps:
+        raise ValueError("Ninguna pestaña del archivo tiene el formato de la plantilla de evaluación.")
+    return maps
+
+
+def discover_gsheet_template_sheets(data_by_sheet: dict, header_text="RESULTADO APRENDIZAJE", activity_row=9) -> dict:
+    """Equivalente a `discover_excel_template_sheets` para `{nombre_pestaña: filas}` de Google Sheets."""
+    maps = {}
+    for sheet_name, data in data_by_sheet.items():
+        try:
+            maps[sheet_name] = build_map_from_gsheet_data(data, header_text, activity_row)
+        except ValueError:
+            continue
+    if not maps:
+        raise ValueError("Ninguna pestaña de la hoja tiene el formato de la plantilla de evaluación.")
+    return maps
@@ -24,76 +24,93 @@ def normalize_name(text: str) -> str:
     return " ".join(filtered_words)
 
 
-def find_match_in_excel(sheet, name_canvas: str, col: str = 'C', start_row: int = 10, end_row: int = 44) -> int | None:
+def build_roster_index(candidates) -> list:
     """
-    Busca la mejor coincidencia para un nombre de Canvas en una hoja de Excel.
-    Devuelve el número de fila si se encuentra una coincidencia, de lo contrario None.
+    Normaliza una sola vez los nombres de la lista de alumnos del destino.
+    `candidates` es un iterable de tuplas (fila, valor de la celda); devuelve una
+    lista de tuplas (fila, nombre, palabras normalizadas, número de palabras) lista
+    para `match_in_roster`. El número de palabras cuenta las repetidas ("García
+    García, Ana" son tres), que el conjunto de palabras no refleja.
+    """
+    index = []
+    for row_idx, cell_value in candidates:
+        if not cell_value:
+            continue
+        words = normalize_name(str(cell_value)).split()
+        index.append((row_idx, str(cell_value), set(words), len(words)))
+    return index
+
+
+def roster_from_excel(sheet, col: str = 'C', start_row: int = 10, end_row: int = 44) -> list:
+    return build_roster_index((row_idx, sheet[f"{col}{row_idx}"].value) for row_idx in range(start_row, end_row + 1))
+
+
+def roster_from_gsheet(sheet_data: list, col_idx: int = 2, start_row: int = 10, end_row: int = 44) -> list:
+    return build_roster_index(
+        (i + start_row, row_data[col_idx])
+        for i, row_data in enumerate(sheet_data[start_row - 1: end_row])
+        if len(row_data) > col_idx
+    )
+
+
+def match_in_roster(roster_index: list, name_canvas: str) -> tuple[int | None, float]:
+    """
+    Elige la fila cuyo nombre comparte más palabras con el de Canvas.
+    Devuelve (fila, confianza) o (None, 0.0) si no hay coincidencia aceptable.
+    La confianza es la fracción de palabras comunes sobre el nombre más largo.
     """
     canvas_parts = set(normalize_name(name_canvas).split())
     if not canvas_parts:
-        return None
+        return None, 0.0
 
-    best_match = {'row': None, 'score': -1, 'name': ''}
-
-    for row_idx in range(start_row, end_row + 1):
-        cell_value = sheet[f"{col}{row_idx}"].value
-        if not cell_value:
-            continue
+    best_match = {'row': None, 'score': -1, 'parts': set(), 'word_count': 0}
 
-        dest_parts = set(normalize_name(str(cell_value)).split())
+    for row_idx, _, dest_parts, word_count in roster_index:
         common_words = len(canvas_parts.intersection(dest_parts))
 
         if common_words > best_match['score']:
             best_match['score'] = common_words
             best_match['row'] = row_idx
-            best_match['name'] = str(cell_value)
+            best_match['parts'] = dest_parts
+            best_match['word_count'] = word_count
 
     if best_match['row'] is None:
-        return None
+        return None, 0.0
 
     is_short_name_match = (
-                len(canvas_parts) <= 2 and len(normalize_name(best_match['name']).split()) <= 2 and best_match[
-            'score'] >= 1)
+                len(canvas_parts) <= 2 and best_match['word_count'] <= 2 and best_match['score'] >= 1)
 
     if best_match['score'] >= 2 or is_short_name_match:
-        return best_match['row']
-
-    return None
-
+        confidence = best_match['score'] / max(len(canvas_parts), len(best_match['parts']))
+        return best_match['row'], round(confidence, 2)
 
-def find_match_in_gsheet(sheet_data: list, name_canvas: str, col_idx: int = 2, start_row: int = 10,
-                         end_row: int = 44) -> int | None:
-    """
-    Busca la mejor coincidencia para un nombre de Canvas en los datos de una hoja de Google.
-    Devuelve el número de fila si se encuentra una coincidencia, de lo contrario None.
-    """
-    canvas_parts = set(normalize_name(name_canvas).split())
-    if not canvas_parts:
-        return None
+    return None, 0.0
 
-    best_match = {'row': None, 'score': -1, 'name': ''}
 
-    for i, row_data in enumerate(sheet_data[start_row - 1: end_row]):
-        current_row_idx = i + start_row
+def match_in_excel(sheet, name_canvas: str, col: str = 'C', start_row: int = 10,
+                   end_row: int = 44) -> tuple[int | None, float]:
+    """Como `find_match_in_excel`, pero devuelve también la confianza del cotejo."""
+    return match_in_roster(roster_from_excel(sheet, col, start_row, end_row), name_canvas)
 
-        if len(row_data) > col_idx and row_data[col_idx]:
-            cell_value = row_data[col_idx]
-            dest_parts = set(normalize_name(cell_value).split())
-            common_words = len(canvas_parts.intersection(dest_parts))
 
-            if common_words > best_match['score']:
-                best_match['score'] = common_words
-                best_match['row'] = current_row_idx
-                best_match['name'] = cell_value
+def match_in_gsheet(sheet_data: list, name_canvas: str, col_idx: int = 2, start_row: int = 10,
+                    end_row: int = 44) -> tuple[int | None, float]:
+    """Como `find_match_in_gsheet`, pero devuelve también la confianza del cotejo."""
+    return match_in_roster(roster_from_gsheet(sheet_data, col_idx, start_row, end_row), name_canvas)
 
-    if best_match['row'] is None:
-        return None
 
-    is_short_name_match = (
-                len(canvas_parts) <= 2 and len(normalize_name(best_match['name']).split()) <= 2 and best_match[
-            'score'] >= 1)
+def find_match_in_excel(sheet, name_canvas: str, col: str = 'C', start_row: int = 10, end_row: int = 44) -> int | None:
+    """
+    Busca la mejor coincidencia para un nombre de Canvas en una hoja de Excel.
+    Devuelve el número de fila si se encuentra una coincidencia, de lo contrario None.
+    """
+    return match_in_excel(sheet, name_canvas, col, start_row, end_row)[0]
 
-    if best_match['score'] >= 2 or is_short_name_match:
-        return best_match['row']
 
-    return None
\ No newline at end of file
+def find_match_in_gsheet(sheet_data: list, name_canvas: str, col_idx: int = 2, start_row: int = 10,
+                         end_row: int = 44) -> int | None:
+    """
+    Busca la mejor coincidencia para un nombre de Canvas en los datos de una hoja de Google.
+    Devuelve el número de fila si se encuentra una coincidencia, de lo contrario None.
+    """
+    return match_in_gsheet(sheet_data, name_canvas, col_idx, start_row, end_row)[0]
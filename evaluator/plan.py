@@ -0,0 +1,72 @@
+# evaluator/plan.py
+
+import json
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+
+from .identity import ORIGIN_MATCHER
+
+WRITE_PLAN_FILE = 'write_plan.json'
+
+
+@dataclass
+class PlannedWrite:
+    """Una celda que se va a escribir, con el valor actual y el nuevo."""
+    cell: str
+    student_name: str
+    matched_name: str
+    old_value: object
+    new_value: float
+    confidence: float
+    user_id: int | None = None
+    origin: str = ORIGIN_MATCHER
+
+    @property
+    def changes(self) -> bool:
+        try:
+            return float(self.old_value) != self.new_value
+        except (TypeError, ValueError):
+            return True
+
+
+@dataclass
+class WritePlan:
+    """
+    Resultado del cotejo: qué celdas se van a escribir en el destino.
+    Se calcula una vez y se puede revisar, guardar en JSON y aplicar después
+    sin repetir la descarga de Canvas ni el cotejo de nombres.
+    """
+    dest_type: str
+    target: str
+    sheet_name: str
+    trimestre: str
+    tarea: str
+    column: str
+    processed: int = 0
+    entries: list = field(default_factory=list)
+    not_found_names: list = field(default_factory=list)
+    source: dict = field(default_factory=dict)
+    created_at: str = field(default_factory=lambda: datetime.now().isoformat(timespec='seconds'))
+
+    @property
+    def pending(self) -> list:
+        """Entradas cuyo valor nuevo difiere del que ya hay en la hoja."""
+        return [entry for entry in self.entries if entry.changes]
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'WritePlan':
+        data = dict(data)
+        data['entries'] = [PlannedWrite(**entry) for entry in data.get('entries', [])]
+        return cls(**data)
+
+    def save(self, path: str = WRITE_PLAN_FILE):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=4, default=str)
+
+    @classmethod
+    def load(cls, path: str = WRITE_PLAN_FILE) -> 'WritePlan':
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_dict(json.load(f))
@@ -0,0 +1,62 @@
+# evaluator/prefetch.py
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _failed(future) -> bool:
+    return future.done() and (future.cancelled() or future.exception() is not None)
+
+
+class Prefetcher:
+    """
+    Lanza descargas en segundo plano para tenerlas listas cuando el usuario las
+    pida. `get` reutiliza el resultado adelantado si es reciente y, si la
+    descarga adelantada falló, vuelve a intentarlo de forma síncrona.
+    """
+
+    def __init__(self, max_workers: int = 4, ttl: float = 300):
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='prefetch')
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def _fresh(self, key):
+        """Descarga reciente (o en curso) de `key`. Las caducadas y las que fallaron se descartan."""
+        item = self._futures.get(key)
+        if item is None:
+            return None
+        started, future = item
+        if time.monotonic() - started > self.ttl or _failed(future):
+            del self._futures[key]
+            return None
+        return future
+
+    def prefetch(self, key, fn, *args, **kwargs):
+        """Programa `fn(*args, **kwargs)` si no hay ya un resultado reciente (o en curso) para `key`."""
+        with self._lock:
+            future = self._fresh(key)
+            if future is None:
+                future = self._executor.submit(fn, *args, **kwargs)
+                self._futures[key] = (time.monotonic(), future)
+            return future
+
+    def get(self, key, fn, *args, **kwargs):
+        with self._lock:
+            future = self._fresh(key)
+        if future is not None:
+            try:
+                return future.result()
+            except Exception as e:
+                logging.warning("Falló la descarga adelantada de %s: %s. Se reintenta.", key, e)
+        self.invalidate(key)
+        return fn(*args, **kwargs)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._futures.pop(key, None)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
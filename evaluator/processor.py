@@ -2,35 +2,135 @@
 
 import logging
 import json
-import openpyxl
 import os
+import queue
 import shutil
+import threading
+import time
+from concurrent.futures import Future
 from datetime import datetime
 import pandas as pd
 
+from . import aggregates
 from . import clients
 from . import mapping
+from . import identity
 from . import matcher
+from . import snapshots
+from .plan import PlannedWrite, WritePlan
+from .session import SheetsSession, WorkbookSession
 
+GRADES_FILE = 'canvas_grades_to_write.json'
+SOURCE_KEYS = ('course_id', 'course_name', 'assignment_id', 'assignment_name')
+STREAM_CHUNK_SIZE = 500
+MAX_REPORTED_NOT_FOUND = 200
+PIPELINE_QUEUE_SIZE = 4
+PIPELINE_POLL_INTERVAL = 0.1
 
-def _write_grades_to_excel(file_path: str, workbook_read_only, grades_to_write: list) -> dict:
-    logging.info(f"Iniciando proceso de escritura para Excel: {file_path}")
+_PIPELINE_END = object()
 
+
+def _log_not_found_summary(not_found_students: list, total: int | None = None):
+    """Registra en una sola entrada los alumnos de Canvas sin coincidencia (`total` si la lista está recortada)."""
+    if not_found_students:
+        logging.warning("No se encontró coincidencia para %d alumnos de Canvas: %s",
+                        total or len(not_found_students), "; ".join(not_found_students))
+
+
+def _load_grades_to_write() -> list:
+    try:
+        with open(GRADES_FILE, 'r', encoding='utf-8') as f:
+            grades_to_write = json.load(f)
+        if not grades_to_write:
+            raise ValueError(f"'{GRADES_FILE}' está vacío.")
+    except FileNotFoundError:
+        raise FileNotFoundError(f"El archivo '{GRADES_FILE}' no existe.")
+    return grades_to_write
+
+
+def _round_score(score):
+    try:
+        return round(float(score), 1)
+    except (ValueError, TypeError):
+        return score
+
+
+def fetch_canvas_grades(curso_id, tarea_id, df_alumnos: pd.DataFrame | None = None,
+                        course_name: str | None = None, assignment_name: str | None = None,
+                        df_calificaciones: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    Descarga las notas de una tarea de Canvas y las cruza con la lista de alumnos
+    del curso. Los alumnos y las notas se descargan si no se pasan (p. ej. porque
+    ya se obtuvieron por adelantado). Cada registro lleva el curso y la tarea de origen.
+    """
+    if df_alumnos is None:
+        df_alumnos = clients.obtener_alumnos(curso_id)
+    if df_calificaciones is None:
+        df_calificaciones = clients.obtener_calificaciones(curso_id, tarea_id)
+    df_alumnos_renamed = df_alumnos.rename(columns={'id': 'user_id'})
+    df_final = pd.merge(df_calificaciones, df_alumnos_renamed, on='user_id', how='right')
+    df_final.dropna(subset=['name'], inplace=True)
+    df_final['score'] = df_final['score'].apply(_round_score)
+    df_final['course_id'] = curso_id
+    df_final['course_name'] = course_name
+    df_final['assignment_id'] = tarea_id
+    df_final['assignment_name'] = assignment_name
+    return df_final
+
+
+def iter_canvas_grades(curso_id, tarea_id, course_name: str | None = None, assignment_name: str | None = None):
+    """
+    Versión en streaming de `fetch_canvas_grades`: genera un registro por entrega
+    a medida que llegan las páginas de Canvas. El nombre del alumno viene en la
+    propia entrega, así que no se descarga ni se guarda la lista del curso.
+    """
+    for submission in clients.iter_calificaciones(curso_id, tarea_id, include_user=True):
+        if not submission['name']:
+            continue
+        yield {'user_id': submission['user_id'], 'name': submission['name'],
+               'score': _round_score(submission['score']), 'course_id': curso_id, 'course_name': course_name,
+               'assignment_id': tarea_id, 'assignment_name': assignment_name}
+
+
+def iter_chunks(records, size: int = STREAM_CHUNK_SIZE):
+    """Agrupa un iterable en listas de como mucho `size` elementos."""
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def save_grades_to_write(df_final: pd.DataFrame):
+    """Guarda las notas en 'canvas_grades_to_write.json' y en la instantánea de notas."""
+    df_final.to_json(GRADES_FILE, orient='records', indent=4, force_ascii=False)
+    snapshots.record_fetched(df_final.to_dict(orient='records'))
+    logging.info("Guardadas %d notas en '%s'.", len(df_final), GRADES_FILE)
+
+
+def _backup_excel(file_path: str) -> str:
     try:
         root, ext = os.path.splitext(file_path)
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         backup_path = f"{root}_backup_{timestamp}{ext}"
         shutil.copy2(file_path, backup_path)
-        logging.info(f"Copia de seguridad creada en: {backup_path}")
+        logging.info("Copia de seguridad creada en: %s", backup_path)
     except Exception as e:
         raise IOError(f"No se pudo crear la copia de seguridad: {e}")
+    return backup_path
 
-    sheet_read = workbook_read_only['EVALUACIÓN']
-
-    written_count = 0
-    not_found_students = []
-    updates_to_perform = {}
 
+def _fill_plan(plan: WritePlan, grades_to_write: list, match_student, read_cell, resolver=None,
+               log_not_found: bool = True):
+    """
+    Cotejo común a Excel y Sheets. `match_student(nombre)` devuelve (fila, confianza)
+    y `read_cell(fila, celda)` devuelve (valor actual, nombre en la hoja). Si se pasa
+    un `IdentityResolver`, los alumnos ya confirmados se resuelven por `user_id`
+    sin cotejar el nombre.
+    """
     for record in grades_to_write:
         student_name = record.get('name')
         score = record.get('score')
@@ -38,103 +138,389 @@ def _write_grades_to_excel(file_path: str, workbook_read_only, grades_to_write:
         if not student_name or pd.isna(score):
             continue
 
-        row_to_write = matcher.find_match_in_excel(sheet_read, student_name)
-
-        if row_to_write:
-            try:
-                score_value = float(score)
-                column = record['target_col']
-                cell = f"{column}{row_to_write}"
-                updates_to_perform[cell] = score_value
-            except (ValueError, TypeError):
-                logging.warning(f"Nota no válida para '{student_name}': {score}. Se omite.")
-                continue
+        hit = resolver.lookup(record.get('user_id')) if resolver else None
+        if hit:
+            row, confidence, origin = hit
         else:
-            not_found_students.append(student_name)
-            logging.warning(f"No se encontró coincidencia para el alumno de Canvas: '{student_name}'")
-
-    if updates_to_perform:
-        logging.info(f"Escribiendo {len(updates_to_perform)} notas en el archivo Excel...")
-        workbook_write = openpyxl.load_workbook(file_path)
-        sheet_write = workbook_write['EVALUACIÓN']
-        for cell, grade in updates_to_perform.items():
-            sheet_write[cell].value = grade
-        workbook_write.save(file_path)
-        workbook_write.close()
-        written_count = len(updates_to_perform)
-
-    return {
-        "processed": len(grades_to_write),
-        "written": written_count,
-        "not_found": len(not_found_students),
-        "not_found_names": not_found_students,
-        "backup_path": backup_path
-    }
-
-
-def _write_grades_to_gsheet(spreadsheet_id: str, grades_to_write: list) -> dict:
-    logging.info(f"Iniciando proceso de escritura para Google Sheet ID: {spreadsheet_id}")
-    sheet_data = clients.get_gsheet_values(spreadsheet_id, "EVALUACIÓN!A1:AZ100")
-    written_count = 0
-    not_found_students = []
+            row, confidence = match_student(student_name)
+            origin = identity.ORIGIN_MATCHER
+        if not row:
+            plan.not_found_names.append(student_name)
+            continue
 
-    for record in grades_to_write:
-        student_name = record.get('name')
-        score = record.get('score')
-        if not student_name or pd.isna(score):
+        try:
+            score_value = float(score)
+        except (ValueError, TypeError):
+            logging.warning("Nota no válida para '%s': %s. Se omite.", student_name, score)
             continue
-        row_to_write = matcher.find_match_in_gsheet(sheet_data, student_name)
-        if row_to_write:
-            try:
-                score_value = float(score)
-                column = record['target_col']
-                range_to_update = f"EVALUACIÓN!{column}{row_to_write}"
-                clients.update_gsheet_values(spreadsheet_id, range_to_update, [[score_value]])
-                written_count += 1
-            except (ValueError, TypeError):
-                logging.warning(f"Nota no válida para '{student_name}': {score}. Se omite.")
-                continue
-        else:
-            not_found_students.append(student_name)
-            logging.warning(f"No se encontró coincidencia para el alumno de Canvas: '{student_name}'")
 
-    return {
-        "processed": len(grades_to_write),
-        "written": written_count,
-        "not_found": len(not_found_students),
-        "not_found_names": not_found_students,
-        "backup_path": None
-    }
+        cell = f"{plan.column}{row}"
+        old_value, matched_name = read_cell(row, cell)
+        plan.entries.append(PlannedWrite(cell=cell, student_name=student_name, matched_name=matched_name,
+                                         old_value=old_value, new_value=score_value, confidence=confidence,
+                                         user_id=record.get('user_id'), origin=origin))
 
+    if log_not_found:
+        _log_not_found_summary(plan.not_found_names)
 
-def run_grade_processing(dest_config: dict) -> dict:
-    logging.info(f"Procesador iniciado. Configuración de destino: {dest_config}")
-    try:
-        with open('canvas_grades_to_write.json', 'r', encoding='utf-8') as f:
-            grades_to_write = json.load(f)
-        if not grades_to_write:
-            raise ValueError("'canvas_grades_to_write.json' está vacío.")
-    except FileNotFoundError:
-        raise FileNotFoundError("El archivo 'canvas_grades_to_write.json' no existe.")
 
-    if dest_config['type'] == 'excel':
-        workbook = openpyxl.load_workbook(dest_config['path'], data_only=True)
-        trimester_map = mapping.build_map_from_excel(workbook)
-    else:
-        sheet_data = clients.get_gsheet_values(dest_config['id'], "EVALUACIÓN")
-        trimester_map = mapping.build_map_from_gsheet_data(sheet_data)
+def _grades_source(grades_to_write: list) -> dict:
+    """Curso y tarea de Canvas de los que proceden las notas, si los registros los incluyen."""
+    first = grades_to_write[0] if grades_to_write else {}
+    return {key: first.get(key) for key in SOURCE_KEYS if first.get(key) is not None}
+
 
+def _find_target_column(trimester_map: list, dest_config: dict) -> str:
     trimestre_info = next((t for t in trimester_map if t['trimestre_name'] == dest_config['trimestre']), None)
     target_column = trimestre_info['tasks'].get(dest_config['tarea']) if trimestre_info else None
     if not target_column:
         raise ValueError(f"No se pudo encontrar la columna para la tarea '{dest_config['tarea']}'.")
+    return target_column
 
-    for record in grades_to_write:
-        record['target_col'] = target_column
+
+def _load_destination(dest_config: dict, sheet_names: set, session):
+    """
+    Lee el destino una sola vez para todas las pestañas pedidas, o reutiliza la
+    sesión (`WorkbookSession` o `SheetsSession`) recibida si cubre esas pestañas.
+    Devuelve (session, mapas, índices de alumnos, lector de celdas por pestaña).
+    """
+    single_default = sheet_names == {mapping.DEFAULT_SHEET_NAME}
 
     if dest_config['type'] == 'excel':
-        result = _write_grades_to_excel(dest_config['path'], workbook, grades_to_write)
-        workbook.close()
-        return result
+        if (not isinstance(session, WorkbookSession) or session.path != dest_config['path']
+                or not sheet_names <= set(session.maps)):
+            session = WorkbookSession(dest_config['path'], all_tabs=not single_default)
+        else:
+            session.ensure_fresh()
+
+        def cell_reader(sheet_name):
+            sheet = session.get_sheet(sheet_name)
+            return lambda row, cell: (sheet[cell].value, sheet[f"C{row}"].value)
+
+        return session, session.maps, session.rosters, cell_reader
+
+    if (not isinstance(session, SheetsSession) or session.spreadsheet_id != dest_config['id']
+            or not sheet_names <= set(session.maps)):
+        session = SheetsSession(dest_config['id'], sheet_names=None if single_default else sorted(sheet_names))
     else:
-        return _write_grades_to_gsheet(dest_config['id'], grades_to_write)
\ No newline at end of file
+        session.ensure_fresh()
+    return session, session.maps, session.rosters, session.cell_reader
+
+
+def _load_target_columns(session, dest_config: dict, columns):
+    """En Google Sheets, lee de una vez los valores actuales de las columnas `(pestaña, letra)` a escribir."""
+    if dest_config['type'] == 'sheets':
+        session.load_columns(columns)
+
+
+def build_write_plans(dest_config: dict, routes: list, session: WorkbookSession | SheetsSession | None = None) -> list:
+    """
+    Calcula un `WritePlan` por cada ruta leyendo el destino una sola vez.
+    Cada ruta es un dict con 'sheet_name', 'trimestre', 'tarea' y, opcionalmente,
+    'grades' (las notas de un curso de Canvas); si no se indican las notas se
+    leen de 'canvas_grades_to_write.json'. Así se pueden enviar las notas de
+    varios cursos a las pestañas de sus grupos en una sola pasada.
+    """
+    logging.info("Calculando plan de escritura. Configuración de destino: %s", dest_config)
+    sheet_names = {route.get('sheet_name') or mapping.DEFAULT_SHEET_NAME for route in routes}
+    session, maps, rosters, cell_reader = _load_destination(dest_config, sheet_names, session)
+    target = dest_config['path'] if dest_config['type'] == 'excel' else dest_config['id']
+    identity_map = identity.IdentityMap()
+
+    columns = []
+    for route in routes:
+        sheet_name = route.get('sheet_name') or mapping.DEFAULT_SHEET_NAME
+        if sheet_name not in maps:
+            raise ValueError(f"La pestaña '{sheet_name}' no tiene el formato de la plantilla de evaluación.")
+        columns.append((sheet_name, _find_target_column(maps[sheet_name], route)))
+    _load_target_columns(session, dest_config, columns)
+
+    plans = []
+    for route, (sheet_name, column) in zip(routes, columns):
+        grades_to_write = route.get('grades')
+        if grades_to_write is None:
+            grades_to_write = _load_grades_to_write()
+
+        plan = WritePlan(dest_type=dest_config['type'], target=target, sheet_name=sheet_name,
+                         trimestre=route['trimestre'], tarea=route['tarea'], column=column,
+                         processed=len(grades_to_write), source=_grades_source(grades_to_write))
+        roster = rosters[sheet_name]
+        resolver = identity_map.resolver(identity.destination_key(target, sheet_name), roster)
+        _fill_plan(plan, grades_to_write, lambda name: matcher.match_in_roster(roster, name), cell_reader(sheet_name),
+                   resolver)
+
+        logging.info("Plan de escritura para '%s': %d celdas cotejadas (%d por identidad conocida), %d con cambios, "
+                     "%d alumnos sin coincidencia.", sheet_name, len(plan.entries),
+                     sum(entry.origin != identity.ORIGIN_MATCHER for entry in plan.entries),
+                     len(plan.pending), len(plan.not_found_names))
+        plans.append(plan)
+    # Si ha cambiado la lista de alumnos, las identidades descartadas se guardan ya, aunque el plan no se aplique.
+    _save_identities(identity_map)
+    return plans
+
+
+def build_write_plan(dest_config: dict, session: WorkbookSession | SheetsSession | None = None,
+                     grades_to_write: list | None = None) -> WritePlan:
+    """
+    Cruza las notas de Canvas con el destino y devuelve el `WritePlan` resultante,
+    sin escribir nada. Si no se pasan las notas se leen de 'canvas_grades_to_write.json'.
+    Para Excel puede recibir la `WorkbookSession` ya cargada por la GUI.
+    """
+    route = {
+        'sheet_name': dest_config.get('sheet_name') or mapping.DEFAULT_SHEET_NAME,
+        'trimestre': dest_config['trimestre'],
+        'tarea': dest_config['tarea'],
+        'grades': grades_to_write,
+    }
+    return build_write_plans(dest_config, [route], session=session)[0]
+
+
+def _save_identities(identity_map: identity.IdentityMap):
+    try:
+        identity_map.save()
+    except OSError as e:
+        logging.warning("No se pudo guardar el mapa de identidades: %s", e)
+
+
+def _confirm_identities(plans: list):
+    """Guarda las filas de los alumnos cotejados en un plan ya aplicado."""
+    identity_map = identity.IdentityMap()
+    for plan in plans:
+        dest_key = identity.destination_key(plan.target, plan.sheet_name)
+        for entry in plan.entries:
+            row = int(entry.cell.lstrip('ABCDEFGHIJKLMNOPQRSTUVWXYZ'))
+            identity_map.confirm(dest_key, entry.user_id, row, entry.matched_name, entry.confidence)
+    _save_identities(identity_map)
+
+
+def apply_write_plans(plans: list, session: WorkbookSession | SheetsSession | None = None,
+                      recalculate: bool = False) -> dict:
+    """
+    Escribe en bloque las celdas que cambian de todos los planes (que deben
+    compartir destino): un único guardado en Excel o una única petición
+    `batchUpdate` en Google Sheets.
+
+    Con `recalculate`, en Excel se calculan además las notas de trimestre de las
+    pestañas afectadas (`aggregates.recalculate`) y se guardan en el mismo
+    guardado. En Google Sheets no hace falta: la propia hoja recalcula sus fórmulas.
+    """
+    if not plans:
+        raise ValueError("No hay ningún plan de escritura que aplicar.")
+    dest_type, target = plans[0].dest_type, plans[0].target
+    if any(plan.dest_type != dest_type or plan.target != target for plan in plans):
+        raise ValueError("Todos los planes deben escribir en el mismo destino.")
+
+    pending = [(plan.sheet_name, entry) for plan in plans for entry in plan.pending]
+    not_found_names = [name for plan in plans for name in plan.not_found_names]
+    backup_path = None
+    recalculated = formula_cells = 0
+
+    if (pending or recalculate) and dest_type == 'excel':
+        logging.info("Iniciando proceso de escritura para Excel: %s", target)
+        if not isinstance(session, WorkbookSession) or session.path != target:
+            session = WorkbookSession(target, all_tabs=True)
+        updates_by_sheet = {}
+        for sheet_name, entry in pending:
+            updates_by_sheet.setdefault(sheet_name, {})[entry.cell] = entry.new_value
+        cached_values = {}
+        if recalculate:
+            cached_values = aggregates.recalculate(session, updates_by_sheet,
+                                                   sheet_names=sorted({plan.sheet_name for plan in plans}))
+        # La copia se hace solo si se llega a guardar algo: las notas de trimestre que son fórmulas no se guardan.
+        backups = []
+        saved = session.write_cells(updates_by_sheet, cached_values=cached_values,
+                                    before_save=lambda: backups.append(_backup_excel(target)))
+        backup_path = backups[0] if backups else None
+        recalculated = saved - sum(len(updates) for updates in updates_by_sheet.values())
+        formula_cells = session.formula_cells(cached_values)
+        if formula_cells:
+            logging.info("%d notas de trimestre son fórmulas: se recalcularán al abrir el libro en Excel.",
+                         formula_cells)
+    elif pending:
+        logging.info("Iniciando proceso de escritura para Google Sheet ID: %s", target)
+        updates_by_sheet = {}
+        for sheet_name, entry in pending:
+            updates_by_sheet.setdefault(sheet_name, {})[entry.cell] = entry.new_value
+        if isinstance(session, SheetsSession) and session.spreadsheet_id == target:
+            session.write_cells(updates_by_sheet)
+        else:
+            clients.batch_update_gsheet_cells(target, updates_by_sheet)
+
+    if any(plan.entries for plan in plans):
+        snapshots.record_written(plans)
+    _confirm_identities(plans)
+
+    return {
+        "processed": sum(plan.processed for plan in plans),
+        "written": len(pending),
+        "unchanged": sum(len(plan.entries) for plan in plans) - len(pending),
+        "not_found": len(not_found_names),
+        "not_found_names": not_found_names,
+        "recalculated": recalculated,
+        "formula_cells": formula_cells,
+        "backup_path": backup_path
+    }
+
+
+def apply_write_plan(plan: WritePlan, session: WorkbookSession | SheetsSession | None = None,
+                     recalculate: bool = False) -> dict:
+    """Aplica un único plan; ver `apply_write_plans`."""
+    return apply_write_plans([plan], session=session, recalculate=recalculate)
+
+
+class _StreamTarget:
+    """
+    Destino ya cargado y mapeado de una sincronización por bloques: coteja cada
+    bloque (`match`), lo escribe (`write`) y acumula el resumen (`finish`).
+    """
+
+    def __init__(self, dest_config: dict, session: WorkbookSession | SheetsSession | None = None):
+        self.dest_config = dest_config
+        self.sheet_name = dest_config.get('sheet_name') or mapping.DEFAULT_SHEET_NAME
+        self.session, maps, rosters, cell_reader = _load_destination(dest_config, {self.sheet_name}, session)
+        if self.sheet_name not in maps:
+            raise ValueError(f"La pestaña '{self.sheet_name}' no tiene el formato de la plantilla de evaluación.")
+        self.target = dest_config['path'] if dest_config['type'] == 'excel' else dest_config['id']
+        self.column = _find_target_column(maps[self.sheet_name], dest_config)
+        _load_target_columns(self.session, dest_config, [(self.sheet_name, self.column)])
+        self.roster = rosters[self.sheet_name]
+        identity_map = identity.IdentityMap()
+        self.resolver = identity_map.resolver(identity.destination_key(self.target, self.sheet_name), self.roster)
+        _save_identities(identity_map)
+        self.read_cell = cell_reader(self.sheet_name)
+        self.excel_plan = self.new_plan()
+        # Todas las tandas de la instantánea comparten identificador: cuentan como una sola sincronización.
+        self.sync_id = snapshots.new_sync_id()
+        self.result = {"processed": 0, "written": 0, "unchanged": 0, "not_found": 0, "not_found_names": [],
+                       "backup_path": None}
+
+    def new_plan(self, chunk=()) -> WritePlan:
+        return WritePlan(dest_type=self.dest_config['type'], target=self.target, sheet_name=self.sheet_name,
+                         trimestre=self.dest_config['trimestre'], tarea=self.dest_config['tarea'],
+                         column=self.column, processed=len(chunk), source=_grades_source(chunk))
+
+    def match(self, chunk: list) -> WritePlan:
+        snapshots.record_fetched(chunk, sync_id=self.sync_id)
+        plan = self.new_plan(chunk)
+        _fill_plan(plan, chunk, lambda name: matcher.match_in_roster(self.roster, name), self.read_cell,
+                   self.resolver, log_not_found=False)
+        pending = len(plan.pending)
+        self.result['processed'] += plan.processed
+        self.result['written'] += pending
+        self.result['unchanged'] += len(plan.entries) - pending
+        self.result['not_found'] += len(plan.not_found_names)
+        room = MAX_REPORTED_NOT_FOUND - len(self.result['not_found_names'])
+        self.result['not_found_names'].extend(plan.not_found_names[:max(0, room)])
+        return plan
+
+    def write(self, plan: WritePlan):
+        pending = plan.pending
+        if self.dest_config['type'] == 'excel':
+            self.excel_plan.source = self.excel_plan.source or plan.source
+            self.excel_plan.entries.extend(plan.entries)
+        elif plan.entries:
+            if pending:
+                self.session.write_cells({self.sheet_name: {entry.cell: entry.new_value for entry in pending}})
+            snapshots.record_written([plan], sync_id=self.sync_id)
+        if plan.entries:
+            _confirm_identities([plan])
+
+    def finish(self) -> dict:
+        pending = self.excel_plan.pending
+        if pending:
+            self.result['backup_path'] = _backup_excel(self.target)
+            self.session.write_cells({self.sheet_name: {entry.cell: entry.new_value for entry in pending}})
+        if self.excel_plan.entries:
+            snapshots.record_written([self.excel_plan], sync_id=self.sync_id)
+        _log_not_found_summary(self.result['not_found_names'], self.result['not_found'])
+        logging.info("Sincronización por bloques terminada: %d notas procesadas, %d escritas, %d sin coincidencia.",
+                     self.result['processed'], self.result['written'], self.result['not_found'])
+        return self.result
+
+
+def stream_grade_processing(dest_config: dict, grades, session: WorkbookSession | SheetsSession | None = None,
+                            chunk_size: int = STREAM_CHUNK_SIZE) -> dict:
+    """
+    Cruza y escribe las notas por bloques a medida que llegan (p. ej. desde
+    `iter_canvas_grades`), sin plan previo. La memoria depende del tamaño de
+    bloque y del tamaño del destino, no del número de entregas: en Google Sheets
+    cada bloque se envía en su propio `batchUpdate`; en Excel solo se acumulan las
+    celdas cotejadas y se guardan al final con un único guardado.
+    """
+    stream = _StreamTarget(dest_config, session)
+    for chunk in iter_chunks(grades, chunk_size):
+        stream.write(stream.match(chunk))
+    return stream.finish()
+
+
+def _put(q: queue.Queue, item, stop: threading.Event) -> bool:
+    """Encola `item` salvo que se haya parado la cadena; devuelve False en ese caso."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=PIPELINE_POLL_INTERVAL)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def pipelined_grade_processing(curso_id, tarea_id, dest_config: dict,
+                               session: WorkbookSession | SheetsSession | None = None,
+                               course_name: str | None = None, assignment_name: str | None = None,
+                               chunk_size: int = STREAM_CHUNK_SIZE) -> dict:
+    """
+    Sincronización completa de una tarea con las etapas solapadas: un hilo
+    descarga las páginas de entregas de Canvas mientras este lee y mapea el
+    destino (con su índice de alumnos); en cuanto el destino está listo, ese hilo
+    coteja cada bloque según llega y este escribe el anterior. La cola entre
+    ambos está acotada, así que la memoria es la de `stream_grade_processing`, y
+    la duración se acerca a la de la etapa más lenta en lugar de a la suma.
+
+    Toda la E/S con Google Sheets se hace en el hilo que llama, que conserva su
+    servicio de Sheets (construir uno por hilo es costoso).
+    """
+    matched = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    destination = Future()
+    stop = threading.Event()
+    timings = {}
+    start = time.perf_counter()
+
+    def fetch_and_match():
+        try:
+            grades = iter_canvas_grades(curso_id, tarea_id, course_name=course_name, assignment_name=assignment_name)
+            for chunk in iter_chunks(grades, chunk_size):
+                if not _put(matched, destination.result().match(chunk), stop):
+                    return
+            timings['canvas'] = time.perf_counter() - start
+            _put(matched, _PIPELINE_END, stop)
+        except BaseException as e:
+            _put(matched, e, stop)
+
+    fetcher = threading.Thread(target=fetch_and_match, name="pipeline-canvas", daemon=True)
+    fetcher.start()
+    try:
+        try:
+            stream = _StreamTarget(dest_config, session)
+        except BaseException as e:
+            destination.set_exception(e)
+            raise
+        destination.set_result(stream)
+        timings['destino'] = time.perf_counter() - start
+        while (item := matched.get()) is not _PIPELINE_END:
+            if isinstance(item, BaseException):
+                raise item
+            stream.write(item)
+    finally:
+        stop.set()
+        fetcher.join()
+
+    result = stream.finish()
+    logging.info("Sincronización encadenada: Canvas %.2f s, destino %.2f s, total %.2f s.",
+                 timings.get('canvas', 0.0), timings.get('destino', 0.0), time.perf_counter() - start)
+    return result
+
+
+def run_grade_processing(dest_config: dict, session: WorkbookSession | SheetsSession | None = None) -> dict:
+    """Calcula el plan de escritura y lo aplica inmediatamente."""
+    plan = build_write_plan(dest_config, session=session)
+    return apply_write_plan(plan, session=session)
@@ -0,0 +1,56 @@
+# evaluator/report_writer.py
+"""
+Escritura de los libros de informes con `openpyxl` en modo `write_only`.
+
+Los procesos de `reports.generate_reports` solo importan este módulo: no debe
+importar las sesiones, los clientes de Canvas y Google ni pandas, que al crear
+cada proceso en Windows se volverían a cargar.
+"""
+
+import openpyxl
+
+KIND_STUDENT = 'alumnos'
+KIND_GROUP = 'grupos'
+
+
+def _write_student_report(path: str, sheet_name: str, columns: list, name: str, grades: list):
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet("Notas")
+    sheet.column_dimensions['A'].width = 18
+    sheet.column_dimensions['B'].width = 14
+    sheet.append(["Alumno", name])
+    sheet.append(["Grupo", sheet_name])
+    sheet.append([])
+    sheet.append(["Trimestre", "Tarea", "Nota"])
+    for (trimestre, task_name, _), grade in zip(columns, grades):
+        sheet.append([trimestre, task_name, grade])
+    workbook.save(path)
+
+
+def _write_group_report(path: str, sheet_name: str, columns: list, students: list):
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_name[:31])
+    sheet.column_dimensions['B'].width = 35
+    # Dos filas de encabezado: el trimestre solo en su primera tarea, y debajo la tarea.
+    trimester_row, previous = ["", ""], None
+    for trimestre, _, _ in columns:
+        trimester_row.append(trimestre if trimestre != previous else "")
+        previous = trimestre
+    sheet.append(trimester_row)
+    sheet.append(["Fila", "Alumno"] + [task_name for _, task_name, _ in columns])
+    for row, name, grades in students:
+        sheet.append([row, name] + grades)
+    workbook.save(path)
+
+
+def write_batch(jobs: list) -> list:
+    """
+    Escribe un lote de informes `(tipo, ruta, ...)` y devuelve sus rutas. Es el
+    punto de entrada de los procesos de `reports.generate_reports`.
+    """
+    for job in jobs:
+        if job[0] == KIND_STUDENT:
+            _write_student_report(*job[1:])
+        else:
+            _write_group_report(*job[1:])
+    return [job[1] for job in jobs]
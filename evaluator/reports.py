@@ -0,0 +1,128 @@
+# evaluator/reports.py
+"""
+Informes de notas por alumno o por grupo a partir del destino ya sincronizado.
+
+Las notas de todas las tareas se leen una sola vez de la plantilla (Excel o
+Google Sheets) y cada informe se escribe con `openpyxl` en modo `write_only`,
+fila a fila, de modo que la memoria no crece con el número de informes. Pocos
+informes se escriben seguidos; a partir de `REPORT_PARALLEL_THRESHOLD` se
+reparten en lotes entre varios procesos. Generar el XML de `openpyxl` es
+Python puro y no avanza en paralelo entre hilos; los procesos ejecutan
+`report_writer`, que solo importa `openpyxl`, no las sesiones ni los clientes:
+
+    python -m evaluator.reports alumnos --excel plantilla.xlsx --all-tabs --out informes
+    python -m evaluator.reports grupos --sheets <ID> --workers 8
+
+Las columnas se rotulan con el trimestre y la tarea del `trimester_map` de
+`mapping`.
+"""
+
+import argparse
+import logging
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import openpyxl
+import openpyxl.utils
+
+from . import setup_logging
+from .report_writer import KIND_GROUP, KIND_STUDENT, write_batch
+
+REPORTS_DIR = 'informes'
+REPORT_BATCH_SIZE = 25
+REPORT_PARALLEL_THRESHOLD = 100
+
+
+def task_columns(trimester_map: list) -> list:
+    """Tuplas (trimestre, tarea, letra) en el orden de las columnas de la plantilla."""
+    columns = [(trimestre['trimestre_name'], task_name, col)
+               for trimestre in trimester_map for task_name, col in trimestre['tasks'].items()]
+    return sorted(columns, key=lambda item: openpyxl.utils.column_index_from_string(item[2]))
+
+
+def read_grade_book(session, sheet_names: list | None = None) -> list:
+    """
+    Lee las notas de todas las tareas de las pestañas indicadas (todas las de la
+    `WorkbookSession` o `SheetsSession` por defecto). Devuelve una lista de grupos
+    `{'sheet_name', 'columns', 'students': [(fila, nombre, [notas])]}`.
+    """
+    sheet_names = sheet_names or session.sheet_names
+    columns_by_sheet = {name: task_columns(session.maps[name]) for name in sheet_names}
+    values = session.column_values((name, col) for name, columns in columns_by_sheet.items()
+                                   for _, _, col in columns)
+    book = []
+    for sheet_name, columns in columns_by_sheet.items():
+        students = [(row, name, [values[(sheet_name, col)].get(row) for _, _, col in columns])
+                    for row, name, _, _ in session.rosters[sheet_name]]
+        book.append({'sheet_name': sheet_name, 'columns': columns, 'students': students})
+    return book
+
+
+def safe_filename(text: str) -> str:
+    return re.sub(r'[\\/:*?"<>|]+', '_', str(text)).strip(' .') or 'informe'
+
+
+def _report_jobs(book: list, kind: str, out_dir: str) -> list:
+    jobs = []
+    for group in book:
+        sheet_name, columns = group['sheet_name'], group['columns']
+        if kind == KIND_GROUP:
+            path = os.path.join(out_dir, f"{safe_filename(sheet_name)}.xlsx")
+            jobs.append((KIND_GROUP, path, sheet_name, columns, group['students']))
+            continue
+        for row, name, grades in group['students']:
+            path = os.path.join(out_dir, f"{safe_filename(sheet_name)} - {row:02d} {safe_filename(name)}.xlsx")
+            jobs.append((KIND_STUDENT, path, sheet_name, columns, name, grades))
+    return jobs
+
+
+def generate_reports(book: list, kind: str = KIND_STUDENT, out_dir: str = REPORTS_DIR,
+                     workers: int | None = None, batch_size: int = REPORT_BATCH_SIZE) -> list:
+    """
+    Genera un informe por alumno (`kind='alumnos'`) o por pestaña (`kind='grupos'`)
+    en `out_dir` y devuelve las rutas. Por debajo de `REPORT_PARALLEL_THRESHOLD`
+    informes se escriben seguidos; si no, en lotes de `batch_size` repartidos
+    entre `workers` procesos.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = _report_jobs(book, kind, out_dir)
+    batches = [jobs[i:i + batch_size] for i in range(0, len(jobs), batch_size)]
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    if workers == 1 or len(batches) <= 1 or len(jobs) < REPORT_PARALLEL_THRESHOLD:
+        paths = [path for batch in batches for path in write_batch(batch)]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(batches))) as executor:
+            paths = [path for written in executor.map(write_batch, batches) for path in written]
+    logging.info("Generados %d informes (%s) en '%s' en %.2f s.", len(paths), kind, out_dir,
+                 time.perf_counter() - start)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera informes de notas por alumno o por grupo.")
+    parser.add_argument('kind', choices=[KIND_STUDENT, KIND_GROUP])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--excel', help="Ruta de la plantilla Excel")
+    source.add_argument('--sheets', help="ID de la hoja de Google")
+    parser.add_argument('--all-tabs', action='store_true', help="Todas las pestañas con formato de plantilla")
+    parser.add_argument('--out', default=REPORTS_DIR)
+    parser.add_argument('--workers', type=int, default=None, help="Procesos en paralelo (por defecto, uno por CPU)")
+    args = parser.parse_args(argv)
+
+    # Importación diferida: los procesos que escriben informes no cargan las sesiones ni los clientes.
+    from .session import SheetsSession, WorkbookSession
+
+    setup_logging()
+    if args.excel:
+        session = WorkbookSession(args.excel, all_tabs=args.all_tabs)
+    else:
+        session = SheetsSession(args.sheets, all_tabs=args.all_tabs)
+    paths = generate_reports(read_grade_book(session), args.kind, args.out, args.workers)
+    print(f"{len(paths)} informes generados en {os.path.abspath(args.out)}")
+
+
+if __name__ == "__main__":
+    main()
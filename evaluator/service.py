@@ -0,0 +1,352 @@
+# evaluator/service.py
+"""
+Servicio HTTP local opcional que expone el procesador y las descargas de Canvas.
+
+Varias copias de la aplicación pueden usar un mismo servicio: las sincronizaciones
+se encolan en un grupo acotado de trabajadores que comparten la conexión con
+Canvas, las cachés de listas y alumnos y las sesiones de libros Excel.
+
+    python -m evaluator.service --port 8765 --workers 4 --queue 32
+
+La GUI actúa como cliente ligero si se define EVALUATOR_SERVICE_URL
+(p. ej. http://127.0.0.1:8765). Endpoints:
+
+    GET  /health
+    GET  /metrics
+    GET  /courses
+    GET  /courses/<id>/assignments
+    POST /destinations/maps   {type, path|id, all_tabs}
+    POST /jobs                {course_id, assignment_id, dest: {...}, apply, stream, recalculate}
+                              o  {plan: {...}, recalculate}
+                              o  {plans: [{...}, ...], recalculate}   (mismo destino, un solo guardado)
+    GET  /jobs
+    GET  /jobs/<id>
+
+El servicio no tiene autenticación: cualquiera que llegue al puerto puede lanzar
+sincronizaciones. Por eso escucha solo en 127.0.0.1 por defecto y únicamente
+abre libros Excel dentro de EVALUATOR_SERVICE_ROOT (o `--root`).
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from . import clients
+from . import processor
+from . import setup_logging
+from . import snapshots
+from .plan import WritePlan
+from .prefetch import Prefetcher
+from .session import SheetsSession, WorkbookSession
+from config.settings import SERVICE_ROOT
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+MAX_FINISHED_JOBS = 500
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class SyncService:
+    """Cola acotada de trabajos de sincronización con estado y métricas compartidas."""
+
+    def __init__(self, workers: int = 4, queue_size: int = 32, roster_ttl: float = 300,
+                 root: str = SERVICE_ROOT):
+        self.root = os.path.realpath(root)
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._jobs = OrderedDict()
+        self._jobs_lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._shared = Prefetcher(max_workers=workers, ttl=roster_ttl)
+        self._sessions = {}
+        self._target_locks = {}
+        self._state_lock = threading.Lock()
+        self._durations = []
+        self.metrics = {'submitted': 0, 'rejected': 0, 'completed': 0, 'failed': 0, 'busy_workers': 0}
+        self.started_at = time.time()
+        self._threads = [threading.Thread(target=self._worker, name=f"sync-worker-{i}", daemon=True)
+                         for i in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    # --- Estado compartido ---
+
+    def _target_lock(self, target: str) -> threading.Lock:
+        """Los trabajos sobre un mismo destino se ejecutan de uno en uno."""
+        with self._state_lock:
+            return self._target_locks.setdefault(target, threading.Lock())
+
+    def _session_for(self, dest: dict, all_tabs: bool = False):
+        """Sesión (libro Excel u hoja de Google) compartida por todos los trabajos que escriben en el mismo destino."""
+        target = dest['path'] if dest['type'] == 'excel' else dest['id']
+        with self._state_lock:
+            session = self._sessions.get(target)
+        if session is None or (all_tabs and not session.all_tabs):
+            if dest['type'] == 'excel':
+                session = WorkbookSession(target, all_tabs=all_tabs)
+            else:
+                session = SheetsSession(target, all_tabs=all_tabs)
+            with self._state_lock:
+                self._sessions[target] = session
+        return session
+
+    def _check_target(self, dest_type: str, target):
+        """Rechaza los libros Excel fuera de `root`: las rutas llegan sin autenticar por HTTP."""
+        if dest_type != 'excel':
+            return
+        if not target:
+            raise ValueError("Falta la ruta del libro Excel.")
+        path = os.path.realpath(target)
+        if os.path.commonpath([self.root, path]) != self.root or not path.lower().endswith(('.xlsx', '.xlsm')):
+            raise ValueError(f"Solo se admiten libros Excel dentro de '{self.root}'.")
+
+    def roster(self, course_id):
+        """Lista de alumnos del curso, compartida entre trabajos durante `roster_ttl` segundos."""
+        return self._shared.prefetch(('alumnos', course_id), clients.obtener_alumnos, course_id).result()
+
+    # --- Trabajos ---
+
+    def submit(self, spec: dict) -> dict:
+        if 'plan' in spec or 'plans' in spec:
+            plans = spec.get('plans') or [spec.get('plan')]
+            if not all(plans):
+                raise ValueError("El trabajo no tiene ningún plan de escritura.")
+            if len({(plan.get('dest_type'), plan.get('target')) for plan in plans}) > 1:
+                raise ValueError("Todos los planes de un trabajo deben escribir en el mismo destino.")
+            self._check_target(plans[0].get('dest_type'), plans[0].get('target'))
+        else:
+            missing = [k for k in ('course_id', 'assignment_id', 'dest') if k not in spec]
+            if missing:
+                raise ValueError(f"Faltan campos en el trabajo: {', '.join(missing)}")
+            self._check_target(spec['dest'].get('type'), spec['dest'].get('path'))
+        job = {'id': str(next(self._ids)), 'status': JOB_QUEUED, 'submitted_at': time.time(),
+               'started_at': None, 'finished_at': None, 'result': None, 'error': None}
+        try:
+            self._queue.put_nowait((job, spec))
+        except queue.Full:
+            with self._state_lock:
+                self.metrics['rejected'] += 1
+            raise QueueFullError("La cola de trabajos está llena. Inténtalo más tarde.")
+        with self._jobs_lock:
+            self._jobs[job['id']] = job
+            self._trim_jobs()
+        with self._state_lock:
+            self.metrics['submitted'] += 1
+        return job
+
+    def _trim_jobs(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job['status'] in (JOB_DONE, JOB_FAILED)]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def get_job(self, job_id: str):
+        with self._jobs_lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def list_jobs(self):
+        with self._jobs_lock:
+            return [{k: v for k, v in job.items() if k != 'result'} for job in self._jobs.values()]
+
+    def _worker(self):
+        while True:
+            job, spec = self._queue.get()
+            job['status'], job['started_at'] = JOB_RUNNING, time.time()
+            with self._state_lock:
+                self.metrics['busy_workers'] += 1
+            try:
+                job['result'] = self._run(spec)
+                job['status'] = JOB_DONE
+            except Exception as e:
+                logging.error("Fallo en el trabajo %s: %s", job['id'], e, exc_info=True)
+                job['error'], job['status'] = str(e), JOB_FAILED
+            finally:
+                job['finished_at'] = time.time()
+                with self._state_lock:
+                    self.metrics['busy_workers'] -= 1
+                    self.metrics['completed' if job['status'] == JOB_DONE else 'failed'] += 1
+                    self._durations.append(job['finished_at'] - job['started_at'])
+                    self._durations = self._durations[-1000:]
+                self._queue.task_done()
+
+    def _run(self, spec: dict) -> dict:
+        if 'plan' in spec or 'plans' in spec:
+            # Un lote de varias pestañas llega como un solo trabajo: un único guardado y una única copia.
+            plans = [WritePlan.from_dict(plan) for plan in spec.get('plans') or [spec['plan']]]
+            plan = plans[0]
+            with self._target_lock(plan.target):
+                if plan.dest_type == 'excel':
+                    session = self._session_for({'type': 'excel', 'path': plan.target}, all_tabs=True)
+                else:
+                    # Escribir en Sheets no necesita leer nada; se usa la sesión existente para mantenerla al día.
+                    with self._state_lock:
+                        session = self._sessions.get(plan.target)
+                result = processor.apply_write_plans(plans, session=session, recalculate=bool(spec.get('recalculate')))
+            return {'result': result}
+
+        dest = spec['dest']
+        target = dest.get('path') or dest.get('id')
+        if spec.get('stream'):
+            # Sin plan previo: la descarga de Canvas se solapa con la lectura del destino y las entregas
+            # se cotejan y escriben por bloques según llegan.
+            with self._target_lock(target):
+                return {'result': processor.pipelined_grade_processing(
+                    spec['course_id'], spec['assignment_id'], dest, session=self._session_for(dest),
+                    course_name=spec.get('course_name'), assignment_name=spec.get('assignment_name'))}
+
+        df_final = processor.fetch_canvas_grades(spec['course_id'], spec['assignment_id'],
+                                                 self.roster(spec['course_id']),
+                                                 course_name=spec.get('course_name'),
+                                                 assignment_name=spec.get('assignment_name'))
+        grades = df_final.to_dict(orient='records')
+        snapshots.record_fetched(grades)
+        with self._target_lock(target):
+            session = self._session_for(dest)
+            plan = processor.build_write_plan(dest, session=session, grades_to_write=grades)
+            result = (processor.apply_write_plan(plan, session=session, recalculate=bool(spec.get('recalculate')))
+                      if spec.get('apply', True) else None)
+        return {'plan': plan.to_dict(), 'result': result}
+
+    def destination_maps(self, dest: dict) -> dict:
+        self._check_target(dest.get('type'), dest.get('path'))
+        with self._target_lock(dest.get('path') or dest.get('id')):
+            session = self._session_for(dest, all_tabs=bool(dest.get('all_tabs')))
+            session.ensure_fresh()
+            return session.maps
+
+    def snapshot_metrics(self) -> dict:
+        with self._state_lock:
+            durations = sorted(self._durations)
+            metrics = dict(self.metrics)
+        metrics['queue_depth'] = self._queue.qsize()
+        metrics['queue_capacity'] = self._queue.maxsize
+        metrics['workers'] = len(self._threads)
+        metrics['uptime_s'] = round(time.time() - self.started_at, 1)
+        if durations:
+            metrics['job_duration_s'] = {
+                'mean': round(sum(durations) / len(durations), 3),
+                'p50': round(durations[len(durations) // 2], 3),
+                'p95': round(durations[min(len(durations) - 1, int(len(durations) * 0.95))], 3),
+                'max': round(durations[-1], 3),
+            }
+        return metrics
+
+
+class _ServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    @property
+    def service(self) -> SyncService:
+        return self.server.service
+
+    def log_message(self, format, *args):
+        logging.debug("Servicio: " + format, *args)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return json.loads(self.rfile.read(length)) if length else {}
+
+    def _handle(self, action):
+        try:
+            status, payload = action()
+        except QueueFullError as e:
+            status, payload = 503, {'error': str(e)}
+        except (ValueError, KeyError, json.JSONDecodeError) as e:
+            status, payload = 400, {'error': str(e)}
+        except Exception as e:
+            logging.error("Error en el servicio: %s", e, exc_info=True)
+            status, payload = 500, {'error': str(e)}
+        self._send_json(status, payload)
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0].rstrip('/')
+
+        def action():
+            if path == '/health':
+                return 200, {'status': 'ok'}
+            if path == '/metrics':
+                return 200, self.service.snapshot_metrics()
+            if path == '/courses':
+                return 200, clients.obtener_cursos()
+            match = re.fullmatch(r'/courses/(\d+)/assignments', path)
+            if match:
+                return 200, clients.obtener_tareas_detalle(int(match.group(1)))
+            if path == '/jobs':
+                return 200, self.service.list_jobs()
+            match = re.fullmatch(r'/jobs/(\w+)', path)
+            if match:
+                job = self.service.get_job(match.group(1))
+                return (200, job) if job else (404, {'error': 'Trabajo no encontrado.'})
+            return 404, {'error': 'Ruta no encontrada.'}
+
+        self._handle(action)
+
+    def do_POST(self):
+        path = self.path.split('?', 1)[0].rstrip('/')
+
+        def action():
+            if path == '/jobs':
+                return 202, self.service.submit(self._read_json())
+            if path == '/destinations/maps':
+                return 200, self.service.destination_maps(self._read_json())
+            return 404, {'error': 'Ruta no encontrada.'}
+
+        self._handle(action)
+
+
+def create_server(host: str = '127.0.0.1', port: int = 8765, workers: int = 4, queue_size: int = 32,
+                  root: str = SERVICE_ROOT):
+    server = ThreadingHTTPServer((host, port), _ServiceHandler)
+    server.daemon_threads = True
+    server.service = SyncService(workers=workers, queue_size=queue_size, root=root)
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio local de sincronización Canvas → Excel/Sheets.")
+    parser.add_argument('--host', default='127.0.0.1',
+                        help="Dirección de escucha. El servicio no tiene autenticación: cualquiera que llegue "
+                             "al puerto puede lanzar sincronizaciones y leer o escribir los libros de --root, "
+                             "así que no lo expongas fuera de 127.0.0.1 sin un proxy que autentique")
+    parser.add_argument('--root', default=SERVICE_ROOT,
+                        help="Carpeta fuera de la cual no se abren libros Excel (EVALUATOR_SERVICE_ROOT)")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=4, help="Trabajos de sincronización simultáneos")
+    parser.add_argument('--queue', type=int, default=32, help="Trabajos en espera como máximo")
+    args = parser.parse_args(argv)
+
+    setup_logging()
+    server = create_server(args.host, args.port, args.workers, args.queue, args.root)
+    logging.info("Servicio escuchando en http://%s:%d (%d trabajadores, cola de %d, libros en '%s').",
+                 args.host, args.port, args.workers, args.queue, server.service.root)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
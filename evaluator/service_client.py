@@ -0,0 +1,70 @@
+# evaluator/service_client.py
+"""Cliente mínimo (solo biblioteca estándar) del servicio local de `evaluator.service`."""
+
+import json
+import time
+import urllib.error
+import urllib.request
+
+
+class ServiceError(Exception):
+    pass
+
+
+class ServiceClient:
+    def __init__(self, base_url: str, timeout: float = 30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+
+    def _request(self, method: str, path: str, payload=None):
+        data = json.dumps(payload).encode('utf-8') if payload is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                         headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read().decode('utf-8'))
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read().decode('utf-8')).get('error', e.reason)
+            except ValueError:
+                message = e.reason
+            raise ServiceError(f"El servicio respondió {e.code}: {message}") from e
+        except urllib.error.URLError as e:
+            raise ServiceError(f"No se pudo conectar con el servicio en {self.base_url}: {e.reason}") from e
+
+    def health(self) -> dict:
+        return self._request('GET', '/health')
+
+    def metrics(self) -> dict:
+        return self._request('GET', '/metrics')
+
+    def courses(self) -> dict:
+        return self._request('GET', '/courses')
+
+    def assignments(self, course_id) -> list:
+        return self._request('GET', f'/courses/{course_id}/assignments')
+
+    def destination_maps(self, dest: dict) -> dict:
+        return self._request('POST', '/destinations/maps', dest)
+
+    def submit_job(self, spec: dict) -> dict:
+        return self._request('POST', '/jobs', spec)
+
+    def job(self, job_id: str) -> dict:
+        return self._request('GET', f'/jobs/{job_id}')
+
+    def wait(self, job_id: str, timeout: float = 300, poll_interval: float = 0.2) -> dict:
+        """Espera a que termine el trabajo y devuelve su resultado; lanza ServiceError si falla."""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = self.job(job_id)
+            if job['status'] == 'done':
+                return job['result']
+            if job['status'] == 'failed':
+                raise ServiceError(job['error'])
+            if time.monotonic() > deadline:
+                raise ServiceError(f"El trabajo {job_id} no terminó en {timeout} s.")
+            time.sleep(poll_interval)
+
+    def run(self, spec: dict, timeout: float = 300) -> dict:
+        return self.wait(self.submit_job(spec)['id'], timeout=timeout)
@@ -0,0 +1,294 @@
+# evaluator/session.py
+
+import logging
+import os
+import threading
+import time
+import openpyxl
+
+from . import clients
+from . import mapping
+from . import matcher
+from config.settings import SHEETS_SESSION_MAX_AGE
+
+HEADER_LAST_ROW = 9
+ROSTER_FIRST_ROW = 10
+ROSTER_LAST_ROW = 44
+NAME_COLUMN = 'C'
+
+
+class WorkbookSession:
+    """
+    Mantiene en memoria una plantilla Excel ya analizada para que el mapeo,
+    el cotejo, la escritura y el refresco de la GUI compartan el mismo estado
+    en lugar de volver a abrir el archivo en cada paso.
+
+    Se guardan dos vistas del libro: la de valores (`data_only=True`), que se
+    usa para mapear y cotejar, y la de fórmulas, que es la que se guarda en
+    disco para no perder las fórmulas de la plantilla. Esta última solo se
+    carga la primera vez que hay algo que escribir.
+
+    Con `all_tabs=True` se analizan en la misma lectura todas las pestañas que
+    siguen el formato de la plantilla (un grupo por pestaña).
+    """
+
+    def __init__(self, path: str, sheet_name: str = mapping.DEFAULT_SHEET_NAME, all_tabs: bool = False):
+        self.path = path
+        self.sheet_name = sheet_name
+        self.all_tabs = all_tabs
+        self.values_workbook = None
+        self.formulas_workbook = None
+        self.maps = {}
+        self.rosters = {}
+        self._mtime = None
+        self.load()
+
+    def load(self):
+        """(Re)lee el archivo desde disco y reconstruye los mapas de actividades y de alumnos."""
+        self.close()
+        mtime = os.path.getmtime(self.path)
+        self.values_workbook = openpyxl.load_workbook(self.path, data_only=True)
+        if self.all_tabs:
+            self.maps = mapping.discover_excel_template_sheets(self.values_workbook)
+            if self.sheet_name not in self.maps:
+                self.sheet_name = next(iter(self.maps))
+        else:
+            self.maps = {self.sheet_name: mapping.build_map_from_excel(self.values_workbook, sheet_name=self.sheet_name)}
+        self.rosters = {name: matcher.roster_from_excel(self.values_workbook[name]) for name in self.maps}
+        self._mtime = mtime
+        logging.info("Sesión de libro cargada: %s (pestañas: %s)", self.path, ", ".join(self.maps))
+
+    def is_stale(self) -> bool:
+        """Indica si el archivo se ha modificado fuera de la aplicación desde la última carga."""
+        try:
+            return os.path.getmtime(self.path) != self._mtime
+        except OSError:
+            return True
+
+    def ensure_fresh(self):
+        if self.is_stale():
+            logging.info("El archivo '%s' ha cambiado en disco. Se vuelve a cargar.", self.path)
+            self.load()
+
+    @property
+    def sheet_names(self) -> list:
+        return list(self.maps)
+
+    @property
+    def trimester_map(self) -> list:
+        """Mapa de actividades de la pestaña activa."""
+        return self.maps[self.sheet_name]
+
+    @property
+    def sheet(self):
+        """Hoja de valores de la pestaña activa, usada para el cotejo de alumnos."""
+        return self.values_workbook[self.sheet_name]
+
+    def get_sheet(self, sheet_name: str):
+        return self.values_workbook[sheet_name]
+
+    def column_values(self, columns) -> dict:
+        """Valores `{(pestaña, letra): {fila: valor}}` de las filas de alumnos en las columnas indicadas."""
+        values = {}
+        for sheet_name, col in set(columns):
+            sheet = self.values_workbook[sheet_name]
+            values[(sheet_name, col)] = {row: sheet[f"{col}{row}"].value for row, _, _, _ in self.rosters[sheet_name]}
+        return values
+
+    def write_cells(self, updates_by_sheet: dict, cached_values: dict | None = None, before_save=None) -> int:
+        """
+        Escribe `{pestaña: {celda: valor}}` en el archivo con un único guardado y
+        refleja los cambios en la vista de valores. Las notas se escriben por
+        debajo de la banda de encabezados y fuera de la columna de nombres, así
+        que los mapas siguen siendo válidos y no se vuelve a analizar el archivo.
+
+        `cached_values` (mismo formato) son valores calculados por la aplicación
+        para celdas que en la plantilla pueden ser fórmulas: se guardan en la
+        vista de valores y, en el mismo guardado, en las celdas que no tienen
+        fórmula. openpyxl no puede guardar el valor en caché de una fórmula, así
+        que esas celdas conservan la fórmula y el libro se marca para que Excel o
+        LibreOffice recalculen todas las fórmulas al abrirlo.
+
+        Devuelve el número de celdas guardadas en el archivo. Si hay alguna, antes
+        de guardar se llama a `before_save()` (p. ej. para la copia de seguridad).
+        """
+        cached_values = cached_values or {}
+        if not any(updates_by_sheet.values()) and not any(cached_values.values()):
+            return 0
+        self.ensure_fresh()
+        self._load_formulas()
+
+        total = 0
+        # Si alguna nota calculada cae sobre una fórmula, hay que guardar al menos la marca de recálculo.
+        mark_recalculation = (self.formula_cells(cached_values) > 0
+                              and not self.formulas_workbook.calculation.fullCalcOnLoad)
+        if cached_values:
+            self.formulas_workbook.calculation.fullCalcOnLoad = True
+        for sheet_name, updates in updates_by_sheet.items():
+            sheet_write = self.formulas_workbook[sheet_name]
+            sheet_values = self.values_workbook[sheet_name]
+            for cell, value in updates.items():
+                sheet_write[cell].value = value
+                sheet_values[cell].value = value
+            total += len(updates)
+        for sheet_name, values in cached_values.items():
+            sheet_write = self.formulas_workbook[sheet_name]
+            sheet_values = self.values_workbook[sheet_name]
+            for cell, value in values.items():
+                sheet_values[cell].value = value
+                if sheet_write[cell].data_type != 'f':
+                    sheet_write[cell].value = value
+                    total += 1
+
+        if not total and not mark_recalculation:
+            return 0
+        if before_save is not None:
+            before_save()
+        self.formulas_workbook.save(self.path)
+        self._mtime = os.path.getmtime(self.path)
+        logging.info("Guardadas %d celdas en '%s'.", total, self.path)
+        return total
+
+    def _load_formulas(self):
+        if self.formulas_workbook is None:
+            self.formulas_workbook = openpyxl.load_workbook(self.path)
+
+    def formula_cells(self, cells_by_sheet: dict) -> int:
+        """Cuántas de las celdas `{pestaña: {celda: valor}}` tienen fórmula en el archivo."""
+        if not any(cells_by_sheet.values()):
+            return 0
+        self._load_formulas()
+        return sum(self.formulas_workbook[sheet_name][cell].data_type == 'f'
+                   for sheet_name, cells in cells_by_sheet.items() for cell in cells)
+
+    def close(self):
+        for workbook in (self.values_workbook, self.formulas_workbook):
+            if workbook is not None:
+                workbook.close()
+        self.values_workbook = None
+        self.formulas_workbook = None
+
+
+class SheetsSession:
+    """
+    Equivalente a `WorkbookSession` para Google Sheets. En lugar de leer el
+    bloque A1:AZ100 en cada paso, un único `batchGet` trae la banda de
+    encabezados (filas 1-9) y la columna de nombres de cada pestaña, sin formato.
+    Las columnas de destino se piden después en otro `batchGet` (una sola
+    petición para todas) cuando ya se sabe qué tarea se va a escribir.
+
+    El mapeo, el cotejo y la escritura comparten estos datos. Los encabezados se
+    consideran vigentes durante `max_age` segundos. Las columnas de destino se
+    vuelven a leer en cada plan para comparar con los valores actuales, y la
+    columna de nombres con ellas, en la misma petición, para no escribir en la
+    fila de otro alumno si alguien ha reordenado la lista.
+    """
+
+    def __init__(self, spreadsheet_id: str, sheet_names: list | None = None, all_tabs: bool = False,
+                 max_age: float = SHEETS_SESSION_MAX_AGE):
+        self.spreadsheet_id = spreadsheet_id
+        self.all_tabs = all_tabs
+        self.max_age = max_age
+        self._requested = list(sheet_names) if sheet_names else None
+        self.maps = {}
+        self.rosters = {}
+        self._names = {}
+        self._columns = {}
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        with self._lock:
+            if self._requested:
+                names = self._requested
+            elif self.all_tabs:
+                names = clients.get_gsheet_sheet_titles(self.spreadsheet_id)
+            else:
+                names = [mapping.DEFAULT_SHEET_NAME]
+            ranges = []
+            for name in names:
+                ranges.append(clients.a1_range(name, f"A1:AZ{HEADER_LAST_ROW}"))
+                ranges.append(clients.a1_range(name, f"{NAME_COLUMN}{ROSTER_FIRST_ROW}:{NAME_COLUMN}{ROSTER_LAST_ROW}"))
+            values = clients.batch_get_gsheet_ranges(self.spreadsheet_id, ranges)
+            headers = {name: values[2 * i] if 2 * i < len(values) else [] for i, name in enumerate(names)}
+            name_rows = {name: values[2 * i + 1] if 2 * i + 1 < len(values) else [] for i, name in enumerate(names)}
+
+            if self.all_tabs and not self._requested:
+                self.maps = mapping.discover_gsheet_template_sheets(headers)
+            else:
+                self.maps = {name: mapping.build_map_from_gsheet_data(headers[name]) for name in names}
+            self._names, self.rosters = {}, {}
+            for name in self.maps:
+                self._set_names(name, name_rows[name])
+            self._columns = {}
+            self._loaded_at = time.monotonic()
+        logging.info("Sesión de Google Sheets cargada: %s (pestañas: %s)", self.spreadsheet_id, ", ".join(self.maps))
+
+    def _set_names(self, sheet_name: str, rows: list):
+        """Actualiza la columna de nombres y el índice de alumnos de una pestaña. Se llama con el cerrojo."""
+        self._names[sheet_name] = {ROSTER_FIRST_ROW + i: row[0] for i, row in enumerate(rows) if row}
+        self.rosters[sheet_name] = matcher.build_roster_index(sorted(self._names[sheet_name].items()))
+
+    def is_stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.max_age
+
+    def ensure_fresh(self):
+        if self.is_stale():
+            self.load()
+
+    @property
+    def sheet_names(self) -> list:
+        return list(self.maps)
+
+    def load_columns(self, columns):
+        """
+        Lee en una sola petición los valores actuales de las columnas `(pestaña, letra)`
+        indicadas y, con ellos, la columna de nombres de esas pestañas.
+        """
+        columns = sorted(set(columns))
+        if not columns:
+            return
+        sheet_names = sorted({sheet_name for sheet_name, _ in columns if sheet_name in self.maps})
+        ranges = [clients.a1_range(sheet_name, f"{col}{ROSTER_FIRST_ROW}:{col}{ROSTER_LAST_ROW}")
+                  for sheet_name, col in columns]
+        ranges += [clients.a1_range(sheet_name, f"{NAME_COLUMN}{ROSTER_FIRST_ROW}:{NAME_COLUMN}{ROSTER_LAST_ROW}")
+                   for sheet_name in sheet_names]
+        values = clients.batch_get_gsheet_ranges(self.spreadsheet_id, ranges)
+        values += [[]] * (len(ranges) - len(values))
+        with self._lock:
+            for key, rows in zip(columns, values):
+                self._columns[key] = {ROSTER_FIRST_ROW + i: row[0] for i, row in enumerate(rows) if row}
+            for sheet_name, rows in zip(sheet_names, values[len(columns):]):
+                self._set_names(sheet_name, rows)
+
+    def column_values(self, columns) -> dict:
+        """Como `WorkbookSession.column_values`; las columnas que no estén ya leídas se piden en un solo `batchGet`."""
+        columns = set(columns)
+        self.load_columns(key for key in columns if key not in self._columns)
+        with self._lock:
+            return {key: dict(self._columns.get(key, {})) for key in columns}
+
+    def cell_reader(self, sheet_name: str):
+        """Lector `(fila, celda) -> (valor actual, nombre en la hoja)` para `processor._fill_plan`."""
+        def read_cell(row, cell):
+            column = self._columns.get((sheet_name, cell.rstrip('0123456789')), {})
+            return column.get(row), self._names.get(sheet_name, {}).get(row)
+
+        return read_cell
+
+    def write_cells(self, updates_by_sheet: dict) -> int:
+        """
+        Escribe `{pestaña: {celda: valor}}` con un único `batchUpdate` y refleja los
+        valores leídos. Devuelve el número de celdas escritas.
+        """
+        if not any(updates_by_sheet.values()):
+            return 0
+        clients.batch_update_gsheet_cells(self.spreadsheet_id, updates_by_sheet)
+        with self._lock:
+            for sheet_name, updates in updates_by_sheet.items():
+                for cell, value in updates.items():
+                    column = self._columns.get((sheet_name, cell.rstrip('0123456789')))
+                    if column is not None:
+                        column[int(cell.lstrip('ABCDEFGHIJKLMNOPQRSTUVWXYZ'))] = value
+        return sum(len(updates) for updates in updates_by_sheet.values())
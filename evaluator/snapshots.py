@@ -0,0 +1,237 @@
+# evaluator/snapshots.py
+"""
+Instantánea columnar de las notas sincronizadas.
+
+Cada sincronización añade a un conjunto de datos Parquet (particionado por
+curso y curso escolar) las notas descargadas de Canvas y las escritas en el
+destino. Los informes de todo el trimestre se calculan sobre ese conjunto, con
+lectura mapeada en memoria, sin volver a pedir nada a Canvas ni abrir ningún
+`.xlsx`:
+
+    python -m evaluator.snapshots tareas --term 2025-26
+    python -m evaluator.snapshots pendientes --course 78207
+    python -m evaluator.snapshots trimestres
+
+Requiere `pyarrow`; si no está instalado las instantáneas se omiten.
+"""
+
+import argparse
+import logging
+import uuid
+from datetime import datetime
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    from pyarrow import fs
+except ImportError:
+    pa = None
+
+SNAPSHOT_DIR = 'grade_snapshots'
+
+STAGE_FETCHED = 'fetched'
+STAGE_WRITTEN = 'written'
+
+if pa is not None:
+    SCHEMA = pa.schema([
+        ('synced_at', pa.timestamp('s')),
+        ('sync_id', pa.string()),
+        ('stage', pa.string()),
+        ('course_id', pa.int64()),
+        ('term', pa.string()),
+        ('course_name', pa.string()),
+        ('assignment_id', pa.int64()),
+        ('assignment_name', pa.string()),
+        ('user_id', pa.int64()),
+        ('student_name', pa.string()),
+        ('score', pa.float64()),
+        ('dest_target', pa.string()),
+        ('dest_sheet', pa.string()),
+        ('trimestre', pa.string()),
+        ('tarea', pa.string()),
+        ('cell', pa.string()),
+        ('changed', pa.bool_()),
+    ])
+    PARTITIONING = ds.partitioning(pa.schema([('course_id', pa.int64()), ('term', pa.string())]), flavor='hive')
+
+
+def current_term(when: datetime | None = None) -> str:
+    """Curso escolar de una fecha ('2025-26'); el curso empieza en septiembre."""
+    when = when or datetime.now()
+    start = when.year if when.month >= 9 else when.year - 1
+    return f"{start}-{(start + 1) % 100:02d}"
+
+
+def _score(value):
+    try:
+        score = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if score != score else score
+
+
+def append_snapshot(rows: list, root: str = SNAPSHOT_DIR):
+    """Añade filas (dicts con las columnas de `SCHEMA`) al conjunto de datos."""
+    if pa is None:
+        logging.info("pyarrow no está instalado; no se guarda la instantánea de notas.")
+        return
+    rows = [row for row in rows if row.get('course_id') is not None]
+    if not rows:
+        return
+    table = pa.Table.from_pylist(rows, schema=SCHEMA)
+    pq.write_to_dataset(table, root, partitioning=PARTITIONING,
+                        basename_template=f"{datetime.now():%Y%m%d_%H%M%S}-{uuid.uuid4().hex[:8]}-{{i}}.parquet",
+                        existing_data_behavior='overwrite_or_ignore')
+    logging.info("Instantánea de notas: %d filas añadidas a '%s'.", table.num_rows, root)
+
+
+def new_sync_id() -> str:
+    """Identificador de una sincronización; los bloques de una misma sincronización por bloques lo comparten."""
+    return uuid.uuid4().hex
+
+
+def record_fetched(grades: list, root: str = SNAPSHOT_DIR, sync_id: str | None = None):
+    """Guarda las notas tal como se descargaron de Canvas. Nunca interrumpe la sincronización."""
+    synced_at, term = datetime.now().replace(microsecond=0), current_term()
+    sync_id = sync_id or new_sync_id()
+    rows = [{
+        'synced_at': synced_at,
+        'sync_id': sync_id,
+        'stage': STAGE_FETCHED,
+        'term': term,
+        'course_id': record.get('course_id'),
+        'course_name': record.get('course_name'),
+        'assignment_id': record.get('assignment_id'),
+        'assignment_name': record.get('assignment_name'),
+        'user_id': record.get('user_id'),
+        'student_name': record.get('name'),
+        'score': _score(record.get('score')),
+    } for record in grades]
+    try:
+        append_snapshot(rows, root)
+    except Exception as e:
+        logging.warning("No se pudo guardar la instantánea de notas descargadas: %s", e)
+
+
+def record_written(plans: list, root: str = SNAPSHOT_DIR, sync_id: str | None = None):
+    """
+    Guarda todas las celdas cotejadas por uno o varios `WritePlan`, con `changed`
+    indicando si se escribieron o ya tenían ese valor. Nunca interrumpe la sincronización.
+    """
+    synced_at, term = datetime.now().replace(microsecond=0), current_term()
+    sync_id = sync_id or new_sync_id()
+    rows = []
+    for plan in plans:
+        for entry in plan.entries:
+            rows.append({
+                'synced_at': synced_at,
+                'sync_id': sync_id,
+                'stage': STAGE_WRITTEN,
+                'term': term,
+                'course_id': plan.source.get('course_id'),
+                'course_name': plan.source.get('course_name'),
+                'assignment_id': plan.source.get('assignment_id'),
+                'assignment_name': plan.source.get('assignment_name'),
+                'user_id': entry.user_id,
+                'student_name': entry.student_name,
+                'score': entry.new_value,
+                'dest_target': plan.target,
+                'dest_sheet': plan.sheet_name,
+                'trimestre': plan.trimestre,
+                'tarea': plan.tarea,
+                'cell': entry.cell,
+                'changed': entry.changes,
+            })
+    try:
+        append_snapshot(rows, root)
+    except Exception as e:
+        logging.warning("No se pudo guardar la instantánea de notas escritas: %s", e)
+
+
+def open_dataset(root: str = SNAPSHOT_DIR):
+    """Abre el conjunto de datos con lectura mapeada en memoria."""
+    if pa is None:
+        raise ImportError("Las consultas sobre instantáneas requieren 'pyarrow' (pip install pyarrow).")
+    return ds.dataset(root, schema=SCHEMA, format='parquet', partitioning=PARTITIONING,
+                      filesystem=fs.LocalFileSystem(use_mmap=True))
+
+
+def load_table(root: str = SNAPSHOT_DIR, stage: str | None = None, course_id: int | None = None,
+               term: str | None = None, columns: list | None = None):
+    """Lee las filas que cumplen los filtros; los filtros de curso y curso escolar podan particiones."""
+    expression = None
+    for field_name, value in (('stage', stage), ('course_id', course_id), ('term', term)):
+        if value is not None:
+            condition = ds.field(field_name) == value
+            expression = condition if expression is None else expression & condition
+    return open_dataset(root).to_table(columns=columns, filter=expression)
+
+
+def _latest_sync(table, keys: list):
+    """
+    Se queda con la última sincronización de cada grupo `keys` (las anteriores son
+    duplicados). Una sincronización por bloques guarda varias tandas con distinta
+    hora pero el mismo `sync_id`, así que se conservan todas las filas de la
+    sincronización a la que pertenece la última tanda. Las filas anteriores a
+    `sync_id` se identifican por su hora.
+    """
+    sync_ids = pc.coalesce(table['sync_id'], pc.cast(table['synced_at'], pa.string()))
+    table = table.set_column(table.schema.get_field_index('sync_id'), 'sync_id', sync_ids)
+    latest = table.group_by(keys).aggregate([('synced_at', 'max')]).rename_columns(keys + ['synced_at'])
+    latest_ids = table.join(latest, keys=keys + ['synced_at'], join_type='inner') \
+        .group_by(keys + ['sync_id']).aggregate([])
+    return table.join(latest_ids, keys=keys + ['sync_id'], join_type='inner')
+
+
+def task_distribution(table):
+    """Distribución de notas por tarea de Canvas, con la última descarga de cada tarea."""
+    table = _latest_sync(table, ['course_id', 'assignment_id'])
+    keys = ['course_name', 'assignment_name']
+    return table.group_by(keys).aggregate([
+        ('score', 'count'), ('score', 'mean'), ('score', 'stddev'), ('score', 'min'),
+        ('score', 'approximate_median'), ('score', 'max'),
+    ]).sort_by([(k, 'ascending') for k in keys])
+
+
+def missing_submissions(table):
+    """Alumnos sin nota por tarea de Canvas, con la última descarga de cada tarea."""
+    table = _latest_sync(table, ['course_id', 'assignment_id'])
+    table = table.append_column('missing', pc.is_null(table['score']).cast(pa.int64()))
+    keys = ['course_name', 'assignment_name']
+    return table.group_by(keys).aggregate([('missing', 'sum'), ('user_id', 'count')]) \
+        .rename_columns(keys + ['sin_nota', 'alumnos']).sort_by([('sin_nota', 'descending')])
+
+
+def trimester_trends(table):
+    """Nota media en el destino por curso y trimestre, con el último valor de cada celda."""
+    table = _latest_sync(table, ['dest_target', 'dest_sheet', 'cell'])
+    keys = ['course_name', 'trimestre']
+    return table.group_by(keys).aggregate([('score', 'mean'), ('score', 'count')]) \
+        .sort_by([(k, 'ascending') for k in keys])
+
+
+REPORTS = {
+    'tareas': (STAGE_FETCHED, task_distribution),
+    'pendientes': (STAGE_FETCHED, missing_submissions),
+    'trimestres': (STAGE_WRITTEN, trimester_trends),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Informes sobre las instantáneas de notas sincronizadas.")
+    parser.add_argument('report', choices=sorted(REPORTS))
+    parser.add_argument('--root', default=SNAPSHOT_DIR)
+    parser.add_argument('--course', type=int, default=None, help="ID del curso de Canvas")
+    parser.add_argument('--term', default=None, help="Curso escolar, p. ej. 2025-26")
+    args = parser.parse_args(argv)
+
+    stage, report = REPORTS[args.report]
+    table = load_table(args.root, stage=stage, course_id=args.course, term=args.term)
+    result = report(table)
+    print(result.to_pandas().to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# load_test.py
+"""
+Prueba de carga de extremo a extremo contra servidores falsos de Canvas y
+Google Sheets (ver `evaluator/fake_servers.py`), sin credenciales reales.
+
+Cada sincronización hace lo mismo que la aplicación: descarga alumnos y notas
+de una tarea de Canvas, calcula el plan de escritura contra la hoja de destino
+y lo aplica. Con `--mode pipeline` se usa en su lugar
+`processor.pipelined_grade_processing`, que solapa la descarga de Canvas con la
+lectura del destino. Al terminar se muestran el rendimiento y la latencia de cola.
+
+    python load_test.py --syncs 200 --workers 8 --latency 0.02 --error-rate 0.01
+    python load_test.py --dest excel --students 35
+    python load_test.py --mode pipeline --latency 0.05
+"""
+
+import argparse
+import logging
+import os
+import random
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from evaluator import clients, processor
+from evaluator.fake_servers import FakeCanvasServer, FakeSheetsServer, FaultInjector, write_template_workbook
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def prepare_destinations(canvas_server, sheets_server, dest, workdir):
+    """Una plantilla por curso con sus alumnos (formato 'Apellidos, Nombre')."""
+    destinations = {}
+    for course_id, course in canvas_server.courses.items():
+        names = [student['sortable_name'] for student in course['students']]
+        if dest == 'excel':
+            path = write_template_workbook(os.path.join(workdir, f"curso_{course_id}.xlsx"), names)
+            destinations[course_id] = {'type': 'excel', 'path': path, 'id': None}
+        else:
+            spreadsheet_id = sheets_server.add_template(f"sheet-{course_id}", names)
+            destinations[course_id] = {'type': 'sheets', 'path': None, 'id': spreadsheet_id}
+    return destinations
+
+
+def run_sync(course, assignment, dest_config, mode='plan'):
+    """Una sincronización completa; devuelve (segundos, notas escritas)."""
+    start = time.perf_counter()
+    if mode == 'pipeline':
+        result = processor.pipelined_grade_processing(
+            course['id'], assignment['id'], dict(dest_config, trimestre="1er Trimestre", tarea=assignment['name']),
+            course_name=course['name'], assignment_name=assignment['name'])
+        return time.perf_counter() - start, result['written']
+    df_final = processor.fetch_canvas_grades(course['id'], assignment['id'], course_name=course['name'],
+                                             assignment_name=assignment['name'])
+    plan = processor.build_write_plan(dict(dest_config, trimestre="1er Trimestre", tarea=assignment['name']),
+                                      grades_to_write=df_final.to_dict(orient='records'))
+    result = processor.apply_write_plan(plan)
+    return time.perf_counter() - start, result['written']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prueba de carga contra Canvas y Google Sheets falsos.")
+    parser.add_argument('--syncs', type=int, default=100, help="Número total de sincronizaciones")
+    parser.add_argument('--workers', type=int, default=4, help="Sincronizaciones concurrentes")
+    parser.add_argument('--courses', type=int, default=5)
+    parser.add_argument('--students', type=int, default=30)
+    parser.add_argument('--dest', choices=['sheets', 'excel'], default='sheets')
+    parser.add_argument('--mode', choices=['plan', 'pipeline'], default='plan',
+                        help="Plan completo por etapas o etapas solapadas en hilos")
+    parser.add_argument('--latency', type=float, default=0.0, help="Latencia fija por petición (s)")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Latencia aleatoria adicional máxima (s)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fracción de peticiones que fallan con 503")
+    parser.add_argument('--canvas-quota', type=int, default=None, help="Cuota de peticiones de Canvas")
+    parser.add_argument('--sheets-quota', type=int, default=None, help="Cuota de peticiones de Sheets")
+    parser.add_argument('--refill', type=float, default=None, help="Recarga de cuota por segundo")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    def faults(quota):
+        return FaultInjector(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                             quota=quota, refill_per_second=args.refill, seed=args.seed)
+
+    rnd = random.Random(args.seed)
+    workdir = tempfile.mkdtemp(prefix="evaluator_load_")
+    os.chdir(workdir)
+
+    with FakeCanvasServer(courses=args.courses, students=args.students, assignments=4,
+                          faults=faults(args.canvas_quota), seed=args.seed) as canvas_server, \
+            FakeSheetsServer(faults=faults(args.sheets_quota)) as sheets_server:
+        clients.connect_canvas(canvas_server.url, "fake-token")
+        clients.SHEETS_API_ENDPOINT = sheets_server.url
+        destinations = prepare_destinations(canvas_server, sheets_server, args.dest, workdir)
+
+        jobs = []
+        for _ in range(args.syncs):
+            course = rnd.choice(list(canvas_server.courses.values()))
+            assignment = rnd.choice(list(course['assignments'].values()))
+            jobs.append((course, assignment, destinations[course['id']]))
+
+        latencies, errors, written = [], {}, 0
+        # Varias escrituras simultáneas sobre el mismo .xlsx se pisarían: en modo Excel se serializa.
+        workers = 1 if args.dest == 'excel' else args.workers
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(run_sync, *job, args.mode) for job in jobs]
+            for future in as_completed(futures):
+                try:
+                    elapsed, count = future.result()
+                    latencies.append(elapsed)
+                    written += count
+                except Exception as e:
+                    errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+        total = time.perf_counter() - start
+
+    print(f"Directorio de trabajo: {workdir}")
+    print(f"Sincronizaciones: {len(latencies)} correctas, {sum(errors.values())} con error {errors or ''}")
+    print(f"Tiempo total: {total:.2f} s  |  {len(latencies) / total:.1f} sinc/s  |  {written / total:.0f} notas escritas/s")
+    if latencies:
+        print(f"Latencia (s): media {statistics.mean(latencies):.3f}  p50 {percentile(latencies, 50):.3f}  "
+              f"p95 {percentile(latencies, 95):.3f}  p99 {percentile(latencies, 99):.3f}  max {max(latencies):.3f}")
+    print(f"Peticiones a Canvas: {canvas_server.request_counts}")
+    print(f"Peticiones a Sheets: {sheets_server.request_counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,18 @@
 # main.py
 
 import logging
-from evaluator import setup_logging, gui
+from evaluator import setup_logging
+from config.settings import LOG_JSON
 
 def main():
     """
     Función principal que configura el logging e inicia la interfaz gráfica.
     """
     try:
-        setup_logging()
+        # La GUI se importa aquí: los procesos que generan informes vuelven a importar este módulo en Windows.
+        from evaluator import gui
+
+        setup_logging(json_log=LOG_JSON)
         app = gui.MainApp()
         app.mainloop()
     except Exception as e:
@@ -0,0 +1,137 @@
+# memory_benchmark.py
+"""
+Compara el pico de memoria (RSS) del flujo clásico (DataFrames + JSON intermedio
++ plan completo) con el flujo por bloques de `processor.stream_grade_processing`
+y su versión con etapas solapadas (`processor.pipelined_grade_processing`) para tareas de 1.000 a 100.000 entregas, contra los servidores falsos de
+`evaluator/fake_servers.py`.
+
+Cada ejecución se hace en un proceso aparte para que su pico de memoria no se
+mezcle con el de los servidores falsos ni con el de las demás ejecuciones.
+
+    python memory_benchmark.py
+    python memory_benchmark.py --sizes 1000,100000 --chunk-size 200 --dest excel
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from evaluator import mapping
+from evaluator.session import WorkbookSession
+from evaluator.fake_servers import FakeCanvasServer, FakeSheetsServer, write_template_workbook
+
+MODES = ('dataframe', 'stream', 'pipeline')
+ROSTER_ROWS = 35
+
+
+def peak_rss_mb() -> float:
+    """Pico de memoria residente del proceso actual (ru_maxrss está en KiB en Linux y en bytes en macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def warm_up(args, clients, snapshots):
+    """
+    Ejercita antes de medir lo que se construye en el primer uso (recursos del
+    cliente de Google generados a partir del documento de descubrimiento,
+    escritor Parquet, lectura de la plantilla), para que la línea base solo deje
+    fuera los datos de la sincronización.
+    """
+    if args.dest == 'sheets':
+        clients.batch_get_gsheet_ranges(args.spreadsheet, [clients.a1_range(mapping.DEFAULT_SHEET_NAME, "A1")])
+        clients.get_sheets_service().spreadsheets().values().batchUpdate(
+            spreadsheetId=args.spreadsheet, body={'valueInputOption': 'USER_ENTERED', 'data': []})
+    else:
+        WorkbookSession(args.path).close()
+    snapshots.append_snapshot([{'course_id': 0, 'term': 'calentamiento', 'stage': 'calentamiento'}],
+                              root=os.path.join('calentamiento', snapshots.SNAPSHOT_DIR))
+
+
+def run_worker(args):
+    """Una sincronización en este proceso; imprime una línea JSON con la memoria y el tiempo."""
+    from evaluator import clients, processor, snapshots
+
+    clients.connect_canvas(args.canvas_url, "fake-token")
+    clients.SHEETS_API_ENDPOINT = args.sheets_url
+    dest_config = {'type': args.dest, 'path': args.path, 'id': args.spreadsheet,
+                   'sheet_name': mapping.DEFAULT_SHEET_NAME, 'trimestre': "1er Trimestre", 'tarea': "TAREA 1"}
+    warm_up(args, clients, snapshots)
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    if args.worker == 'dataframe':
+        df_final = processor.fetch_canvas_grades(args.course, args.assignment, course_name="Curso",
+                                                 assignment_name="TAREA 1")
+        processor.save_grades_to_write(df_final)
+        del df_final
+        result = processor.run_grade_processing(dest_config)
+    elif args.worker == 'pipeline':
+        result = processor.pipelined_grade_processing(args.course, args.assignment, dest_config,
+                                                      course_name="Curso", assignment_name="TAREA 1",
+                                                      chunk_size=args.chunk_size)
+    else:
+        grades = processor.iter_canvas_grades(args.course, args.assignment, course_name="Curso",
+                                              assignment_name="TAREA 1")
+        result = processor.stream_grade_processing(dest_config, grades, chunk_size=args.chunk_size)
+    print(json.dumps({'baseline_mb': baseline, 'peak_mb': peak_rss_mb(), 'seconds': time.perf_counter() - start,
+                      'processed': result['processed'], 'written': result['written']}))
+
+
+def spawn(mode, size, canvas_server, sheets_url, course_id, args, workdir):
+    course = canvas_server.courses[course_id]
+    names = [student['sortable_name'] for student in course['students'][:ROSTER_ROWS]]
+    run_dir = tempfile.mkdtemp(prefix=f"{mode}_{size}_", dir=workdir)
+    command = [sys.executable, os.path.abspath(__file__), '--worker', mode, '--canvas-url', canvas_server.url,
+               '--sheets-url', sheets_url, '--course', str(course_id), '--assignment', str(course_id * 100),
+               '--dest', args.dest, '--chunk-size', str(args.chunk_size)]
+    if args.dest == 'excel':
+        command += ['--path', write_template_workbook(os.path.join(run_dir, "plantilla.xlsx"), names)]
+    else:
+        command += ['--spreadsheet', args.sheets_server.add_template(f"sheet-{mode}-{size}", names)]
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run(command, cwd=run_dir, env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pico de memoria del flujo clásico frente al flujo por bloques.")
+    parser.add_argument('--sizes', default="1000,10000,100000", help="Entregas por tarea, separadas por comas")
+    parser.add_argument('--modes', default=",".join(MODES))
+    parser.add_argument('--chunk-size', type=int, default=500)
+    parser.add_argument('--dest', choices=['sheets', 'excel'], default='sheets')
+    parser.add_argument('--worker', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--canvas-url', help=argparse.SUPPRESS)
+    parser.add_argument('--sheets-url', help=argparse.SUPPRESS)
+    parser.add_argument('--course', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--assignment', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--path', help=argparse.SUPPRESS)
+    parser.add_argument('--spreadsheet', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    modes = [mode for mode in args.modes.split(',') if mode in MODES]
+    workdir = tempfile.mkdtemp(prefix="evaluator_memory_")
+    print(f"{'entregas':>9} {'flujo':>10} {'base MB':>8} {'pico MB':>8} {'extra MB':>9} {'tiempo s':>9} {'escritas':>9}")
+    with FakeSheetsServer() as sheets_server:
+        args.sheets_server = sheets_server
+        for size in sizes:
+            with FakeCanvasServer(courses=1, students=size, assignments=1) as canvas_server:
+                course_id = next(iter(canvas_server.courses))
+                for mode in modes:
+                    stats = spawn(mode, size, canvas_server, sheets_server.url, course_id, args, workdir)
+                    print(f"{size:>9} {mode:>10} {stats['baseline_mb']:>8.1f} {stats['peak_mb']:>8.1f} "
+                          f"{stats['peak_mb'] - stats['baseline_mb']:>9.1f} {stats['seconds']:>9.2f} "
+                          f"{stats['written']:>9}")
+    print(f"Directorio de trabajo: {workdir}")
+
+
+if __name__ == "__main__":
+    main()
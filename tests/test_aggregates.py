@@ -0,0 +1,65 @@
+import glob
+
+import openpyxl
+
+from evaluator import processor
+from evaluator.plan import PlannedWrite, WritePlan
+
+
+def _template(path, grade_formula: bool):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = 'EVALUACIÓN'
+    sheet['E5'] = "RESULTADO APRENDIZAJE 1"
+    sheet.merge_cells('E5:G5')
+    sheet['E9'], sheet['F9'], sheet['G9'] = "TAREA 1", "TAREA 2", "NOTA"
+    sheet['C10'], sheet['E10'], sheet['F10'] = "Pérez, Juan", 4, 6
+    sheet['C11'] = "García, Ana"
+    if grade_formula:
+        sheet['G10'], sheet['G11'] = "=AVERAGE(E10:F10)", "=AVERAGE(E11:F11)"
+    else:
+        sheet['G11'] = "EXENTA"
+    # Como una plantilla guardada desde Excel: openpyxl marca sus libros para recalcular por defecto.
+    workbook.calculation.fullCalcOnLoad = False
+    workbook.save(path)
+
+
+def _plan(path, entries=()):
+    plan = WritePlan(dest_type='excel', target=path, sheet_name='EVALUACIÓN', trimestre="1er Trimestre",
+                     tarea="TAREA 1", column='E')
+    plan.entries = list(entries)
+    return plan
+
+
+def test_formula_grades_are_left_to_excel_to_recalculate(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / "plantilla.xlsx")
+    _template(path, grade_formula=True)
+
+    result = processor.apply_write_plans([_plan(path)], recalculate=True)
+
+    assert (result['recalculated'], result['formula_cells']) == (0, 1)
+    workbook = openpyxl.load_workbook(path)
+    assert workbook['EVALUACIÓN']['G10'].value == "=AVERAGE(E10:F10)"
+    assert workbook.calculation.fullCalcOnLoad
+    assert len(glob.glob(str(tmp_path / "*_backup_*"))) == 1
+
+    # El libro ya está marcado: sin notas que escribir no se vuelve a guardar ni a copiar.
+    result = processor.apply_write_plans([_plan(path)], recalculate=True)
+    assert result['backup_path'] is None
+    assert len(glob.glob(str(tmp_path / "*_backup_*"))) == 1
+
+
+def test_students_without_grades_keep_typed_values(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / "plantilla.xlsx")
+    _template(path, grade_formula=False)
+    entry = PlannedWrite(cell='E10', student_name="Juan Pérez", matched_name="Pérez, Juan", old_value=4,
+                         new_value=8.0, confidence=1.0)
+
+    result = processor.apply_write_plans([_plan(path, [entry])], recalculate=True)
+
+    sheet = openpyxl.load_workbook(path)['EVALUACIÓN']
+    assert (sheet['G10'].value, sheet['G11'].value) == (7.0, "EXENTA")
+    assert result['recalculated'] == 1
+    assert result['backup_path'] is not None
@@ -0,0 +1,113 @@
+import threading
+
+import openpyxl
+
+from evaluator import identity, matcher, processor
+
+
+def _roster(names: dict) -> list:
+    return matcher.build_roster_index([(row, name) for row, name in names.items()])
+
+
+def test_concurrent_saves_keep_every_confirmation(tmp_path):
+    path = str(tmp_path / "identity_map.json")
+    dest_key = identity.destination_key("plantilla.xlsx", "1A")
+    maps = [identity.IdentityMap(path) for _ in range(8)]
+    for user_id, identity_map in enumerate(maps):
+        identity_map.confirm(dest_key, user_id, 10 + user_id, f"Alumno {user_id}")
+    threads = [threading.Thread(target=identity_map.save) for identity_map in maps]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    rows = identity.IdentityMap(path).destinations[dest_key]['rows']
+    assert sorted(rows, key=int) == [str(user_id) for user_id in range(8)]
+
+
+def test_save_keeps_overrides_saved_by_another_instance(tmp_path):
+    path = str(tmp_path / "identity_map.json")
+    dest_key = identity.destination_key("plantilla.xlsx", "1A")
+    first, second = identity.IdentityMap(path), identity.IdentityMap(path)
+    first.set_override(dest_key, 1, "García López, María")
+    first.save()
+    second.confirm(dest_key, 2, 11, "Pérez, Juan")
+    second.save()
+
+    entry = identity.IdentityMap(path).destinations[dest_key]
+    assert entry['overrides'] == {'1': "García López, María"}
+    assert entry['rows']['2']['row'] == 11
+
+
+def test_resolver_prunes_rows_when_roster_changes(tmp_path):
+    path = str(tmp_path / "identity_map.json")
+    dest_key = identity.destination_key("plantilla.xlsx", "1A")
+    identity_map = identity.IdentityMap(path)
+    roster = _roster({10: "García López, María", 11: "Pérez, Juan"})
+    identity_map.resolver(dest_key, roster)
+    identity_map.confirm(dest_key, 1, 10, "García López, María")
+    identity_map.confirm(dest_key, 2, 11, "Pérez, Juan")
+    identity_map.save()
+
+    # Se inserta un alumno en la fila 10: María baja a la 11 y Juan a la 12.
+    identity_map = identity.IdentityMap(path)
+    moved = _roster({10: "Abad, Luis", 11: "García López, María", 12: "Pérez, Juan"})
+    resolver = identity_map.resolver(dest_key, moved)
+    assert identity_map.destinations[dest_key]['rows'] == {}
+    assert resolver.lookup(1) is None
+
+    # Un cambio que no afecta a las filas conocidas las conserva.
+    identity_map.confirm(dest_key, 1, 11, "García López, María")
+    identity_map.save()
+    renamed = _roster({10: "Abad Ruiz, Luis", 11: "García López, María", 12: "Pérez, Juan"})
+    resolver = identity.IdentityMap(path).resolver(dest_key, renamed)
+    assert resolver.lookup(1) == (11, 1.0, identity.ORIGIN_IDENTITY)
+
+
+def _template(path, names):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = 'EVALUACIÓN'
+    sheet['E5'] = "RESULTADO APRENDIZAJE 1"
+    sheet.merge_cells('E5:F5')
+    sheet['E9'], sheet['F9'] = "TAREA 1", "TAREA 2"
+    for row, name in enumerate(names, start=10):
+        sheet[f"C{row}"] = name
+    workbook.save(path)
+
+
+def _build(path):
+    dest_config = {'type': 'excel', 'path': path, 'trimestre': "1er Trimestre", 'tarea': "TAREA 1"}
+    grades = [{'user_id': 1, 'name': "Juan Pérez", 'score': 8}, {'user_id': 2, 'name': "Luis", 'score': 5}]
+    return processor.build_write_plan(dest_config, grades_to_write=grades)
+
+
+def test_identity_keeps_the_confidence_of_the_original_match(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / "plantilla.xlsx")
+    _template(path, ["Pérez, Juan", "Gómez, Luis"])
+    processor.apply_write_plan(_build(path))
+
+    entries = {entry.user_id: entry for entry in _build(path).entries}
+    assert (entries[1].cell, entries[1].confidence, entries[1].origin) == ('E10', 1.0, identity.ORIGIN_IDENTITY)
+    assert (entries[2].cell, entries[2].confidence, entries[2].origin) == ('E11', 0.5, identity.ORIGIN_IDENTITY)
+
+
+def test_build_saves_roster_changes_without_applying(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / "plantilla.xlsx")
+    dest_key = identity.destination_key(path, 'EVALUACIÓN')
+    _template(path, ["Pérez, Juan", "Gómez, Luis"])
+    processor.apply_write_plan(_build(path))
+    # El siguiente plan apunta el hash de la lista de alumnos a la que corresponden las identidades.
+    _build(path)
+    saved = identity.IdentityMap().destinations[dest_key]
+    assert saved['roster_hash'] is not None
+    assert sorted(saved['rows']) == ['1', '2']
+
+    # Alguien inserta un alumno al principio: las filas guardadas ya no coinciden.
+    _template(path, ["Abad, Ana", "Pérez, Juan", "Gómez, Luis"])
+    plan = _build(path)
+    saved = identity.IdentityMap().destinations[dest_key]
+    assert saved['rows'] == {}
+    assert {entry.user_id: entry.cell for entry in plan.entries} == {1: 'E11', 2: 'E12'}
@@ -0,0 +1,23 @@
+import json
+import logging
+
+import evaluator
+
+
+def test_json_log_keeps_the_traceback_apart(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    evaluator.setup_logging(json_log=True)
+    try:
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            logging.error("Fallo al dividir %s", "notas", exc_info=True)
+    finally:
+        evaluator.stop_logging()
+        logging.getLogger().handlers.clear()
+
+    entry = json.loads((tmp_path / evaluator.JSON_LOG_FILENAME).read_text(encoding='utf-8').splitlines()[-1])
+    assert entry['message'] == "Fallo al dividir notas"
+    assert "ZeroDivisionError" in entry['exc_info']
+    text_log = (tmp_path / evaluator.LOG_FILENAME).read_text(encoding='utf-8')
+    assert text_log.count("Traceback") == 1
@@ -0,0 +1,19 @@
+from evaluator import matcher
+
+
+def test_repeated_surname_is_not_a_short_name():
+    # "García García, Ana" tiene tres palabras aunque solo dos sean distintas:
+    # no debe aceptarse con una sola palabra en común.
+    roster = matcher.build_roster_index([(10, "García García, Ana")])
+    assert matcher.match_in_roster(roster, "García, Pedro") == (None, 0.0)
+
+
+def test_short_names_match_on_one_common_word():
+    roster = matcher.build_roster_index([(10, "Pérez, Ana"), (11, "Gómez, Luis")])
+    assert matcher.match_in_roster(roster, "Ana Pérez") == (10, 1.0)
+    assert matcher.match_in_roster(roster, "Luis") == (11, 0.5)
+
+
+def test_roster_index_counts_repeated_words():
+    assert matcher.build_roster_index([(10, "García García, Ana"), (11, None)]) == [
+        (10, "García García, Ana", {'garcia', 'ana'}, 3)]
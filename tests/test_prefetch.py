@@ -0,0 +1,21 @@
+import pytest
+
+from evaluator.prefetch import Prefetcher
+
+
+def test_failed_prefetch_is_retried():
+    prefetcher = Prefetcher(max_workers=1)
+    calls = []
+
+    def fetch():
+        calls.append(None)
+        if len(calls) == 1:
+            raise ConnectionError("Canvas no responde")
+        return ['alumno']
+
+    with pytest.raises(ConnectionError):
+        prefetcher.prefetch('alumnos', fetch).result()
+    assert prefetcher.prefetch('alumnos', fetch).result() == ['alumno']
+    assert prefetcher.prefetch('alumnos', fetch).result() == ['alumno']
+    assert len(calls) == 2
+    prefetcher.shutdown()
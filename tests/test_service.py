@@ -0,0 +1,53 @@
+import glob
+import time
+
+import openpyxl
+import pytest
+
+from evaluator.plan import PlannedWrite, WritePlan
+from evaluator.service import JOB_DONE, JOB_FAILED, SyncService
+
+
+def _plan(path, column, row, value):
+    plan = WritePlan(dest_type='excel', target=path, sheet_name='EVALUACIÓN', trimestre="1er Trimestre",
+                     tarea=f"TAREA {ord(column) - ord('D')}", column=column)
+    plan.entries = [PlannedWrite(cell=f"{column}{row}", student_name="Juan Pérez", matched_name="Pérez, Juan",
+                                 old_value=None, new_value=value, confidence=1.0)]
+    return plan.to_dict()
+
+
+def _wait(service, job_id):
+    for _ in range(200):
+        job = service.get_job(job_id)
+        if job['status'] in (JOB_DONE, JOB_FAILED):
+            return job
+        time.sleep(0.05)
+    raise TimeoutError(job_id)
+
+
+def test_batch_of_plans_is_one_job_with_one_save(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / "plantilla.xlsx")
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = 'EVALUACIÓN'
+    sheet['E5'] = "RESULTADO APRENDIZAJE 1"
+    sheet.merge_cells('E5:F5')
+    sheet['E9'], sheet['F9'], sheet['C10'] = "TAREA 1", "TAREA 2", "Pérez, Juan"
+    workbook.save(path)
+    service = SyncService(workers=1, root=str(tmp_path))
+
+    job = _wait(service, service.submit({'plans': [_plan(path, 'E', 10, 7.0), _plan(path, 'F', 10, 9.0)]})['id'])
+
+    assert job['status'] == JOB_DONE, job['error']
+    assert job['result']['result']['written'] == 2
+    assert len(glob.glob(str(tmp_path / "*_backup_*"))) == 1
+    sheet = openpyxl.load_workbook(path)['EVALUACIÓN']
+    assert (sheet['E10'].value, sheet['F10'].value) == (7.0, 9.0)
+
+
+def test_batch_rejects_plans_for_different_targets(tmp_path):
+    service = SyncService(workers=1, root=str(tmp_path))
+    plans = [_plan(str(tmp_path / "a.xlsx"), 'E', 10, 1.0), _plan(str(tmp_path / "b.xlsx"), 'E', 10, 1.0)]
+    with pytest.raises(ValueError):
+        service.submit({'plans': plans})
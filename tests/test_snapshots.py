@@ -0,0 +1,57 @@
+import itertools
+
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from evaluator import snapshots
+from evaluator.plan import PlannedWrite, WritePlan
+
+
+def _grades(first, count, assignment_id=7):
+    return [{'course_id': 1, 'course_name': "Curso", 'assignment_id': assignment_id, 'assignment_name': "TAREA 1",
+             'user_id': uid, 'name': f"Alumno {uid}", 'score': 5.0} for uid in range(first, first + count)]
+
+
+def _tick_clock(monkeypatch):
+    """Cada llamada a `datetime.now()` en `snapshots` avanza un segundo."""
+    seconds = itertools.count()
+    real_now = snapshots.datetime.now
+    monkeypatch.setattr(snapshots, 'datetime', type('FakeDatetime', (), {
+        'now': staticmethod(lambda: real_now().replace(second=next(seconds)))}))
+
+
+def test_streamed_chunks_count_as_one_sync(tmp_path, monkeypatch):
+    root = str(tmp_path / "snapshots")
+    # Cada tanda con una hora distinta, como en una sincronización por bloques larga.
+    _tick_clock(monkeypatch)
+    sync_id = snapshots.new_sync_id()
+    for first in range(0, 2000, 500):
+        snapshots.record_fetched(_grades(first, 500), root=root, sync_id=sync_id)
+
+    table = snapshots.load_table(root, stage=snapshots.STAGE_FETCHED)
+    result = snapshots.missing_submissions(table).to_pylist()
+    assert result == [{'course_name': "Curso", 'assignment_name': "TAREA 1", 'sin_nota': 0, 'alumnos': 2000}]
+
+
+def _plan(scores, old_scores=None):
+    old_scores = old_scores or {}
+    plan = WritePlan(dest_type='excel', target="plantilla.xlsx", sheet_name="1A", trimestre="1ER TRIMESTRE",
+                     tarea="TAREA 1", column='E', source={'course_id': 1, 'course_name': "Curso", 'assignment_id': 7})
+    plan.entries = [PlannedWrite(cell=f"E{row}", student_name=f"Alumno {row}", matched_name=f"Alumno {row}",
+                                 old_value=old_scores.get(row), new_value=score, confidence=1.0, user_id=row)
+                    for row, score in scores.items()]
+    return plan
+
+
+def test_trends_keep_unchanged_cells_of_earlier_syncs(tmp_path, monkeypatch):
+    root = str(tmp_path / "snapshots")
+    _tick_clock(monkeypatch)
+    snapshots.record_written([_plan({10: 4.0, 11: 6.0, 12: 8.0})], root=root)
+    # La segunda sincronización solo cambia una nota; las demás ya estaban en la hoja.
+    snapshots.record_written([_plan({10: 10.0, 11: 6.0, 12: 8.0}, old_scores={11: 6.0, 12: 8.0})], root=root)
+
+    table = snapshots.load_table(root, stage=snapshots.STAGE_WRITTEN)
+    assert sorted(table['changed'].to_pylist()) == [False, False, True, True, True, True]
+    result = snapshots.trimester_trends(table).to_pylist()
+    assert result == [{'course_name': "Curso", 'trimestre': "1ER TRIMESTRE", 'score_mean': 8.0, 'score_count': 3}]